@@ -1,23 +1,185 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.routing import APIRoute
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ReturnDocument, monitoring
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
 import os
+import re
+import hmac
+import sys
+import socket
+import random
 import logging
+import threading
+import functools
+import contextlib
+import contextvars
+from collections import Counter
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 import uuid
+import time
+import bisect
+import asyncio
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
 from twilio.rest import Client
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request profiling defaults, adjustable at runtime through /api/profiling
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_REQUEST_MS = float(os.environ.get('PROFILE_SLOW_REQUEST_MS', '1000'))
+PROFILE_SLOW_COMMAND_MS = float(os.environ.get('PROFILE_SLOW_COMMAND_MS', '100'))
+PROFILE_LOG_BYTES = int(os.environ.get('PROFILE_LOG_BYTES', str(16 * 1024 * 1024)))
+PROFILE_COLLECTIONS = ('slow_log', 'request_profiles')
+# Secret a client sends as the X-Profile header to profile one request; header profiling is off when unset
+PROFILE_HEADER_TOKEN = os.environ.get('PROFILE_HEADER_TOKEN', '')
+
+
+# Request Profiling
+class RequestProfile:
+    """Timings collected for one API request"""
+    
+    def __init__(self):
+        self.commands: List[dict] = []
+        self.route_ms: Optional[float] = None
+        self.endpoint_ms: Optional[float] = None
+        self.sampler: Optional['StackSampler'] = None
+    
+    @property
+    def mongo_ms(self) -> float:
+        return sum(command['duration_ms'] for command in self.commands)
+
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar('current_profile', default=None)
+
+class CommandProfiler(monitoring.CommandListener):
+    """Attributes Mongo command timings to the current request and captures slow commands"""
+    
+    def __init__(self):
+        self.slow_command_ms = PROFILE_SLOW_COMMAND_MS
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending: Dict[tuple, tuple] = {}
+    
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get('collection')
+        if collection in PROFILE_COLLECTIONS:
+            return
+        
+        # Motor runs commands on its executor with a copy of the caller's context, so the request is visible here.
+        # The command is only kept by reference; its shape is rendered in finish() for slow commands alone.
+        self.pending[(event.connection_id, event.request_id)] = (collection, event.command, current_profile.get())
+    
+    def succeeded(self, event):
+        self.finish(event, "success")
+    
+    def failed(self, event):
+        self.finish(event, "failed")
+    
+    def finish(self, event, status: str):
+        started = self.pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        
+        collection, command, profile = started
+        duration_ms = event.duration_micros / 1000
+        if profile is not None:
+            profile.commands.append({
+                "command": event.command_name,
+                "collection": collection,
+                "duration_ms": duration_ms
+            })
+        
+        if duration_ms >= self.slow_command_ms and self.loop is not None:
+            shape = {
+                key: str(command[key])[:1000]
+                for key in ('filter', 'sort', 'projection', 'pipeline', 'query', 'updates', 'deletes', 'limit')
+                if key in command
+            }
+            entry = {
+                "id": str(uuid.uuid4()),
+                "type": "command",
+                "command": event.command_name,
+                "collection": collection,
+                "shape": shape,
+                "status": status,
+                "duration_ms": duration_ms,
+                "worker": WORKER_ID,
+                "created_at": datetime.now(timezone.utc)
+            }
+            self.loop.call_soon_threadsafe(lambda: asyncio.ensure_future(db.slow_log.insert_one(entry)))
+
+class StackSampler(threading.Thread):
+    """Periodically samples the event loop thread's stack while a profiled request runs"""
+    
+    def __init__(self, thread_id: int, interval_ms: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.counts: Counter = Counter()
+        self.stopped = threading.Event()
+    
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < 30:
+                stack.append(f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[" <- ".join(stack)] += 1
+    
+    def stop(self):
+        self.stopped.set()
+        self.join(timeout=1)
+    
+    def top(self, limit: int = 20) -> List[dict]:
+        # The loop thread is shared, so samples also include other requests running concurrently
+        return [{"stack": stack, "samples": count} for stack, count in self.counts.most_common(limit)]
+
+class ProfiledRoute(APIRoute):
+    """Splits a request's time into the endpoint body and FastAPI's validation and serialization around it"""
+    
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **endpoint_kwargs):
+            started = time.perf_counter()
+            try:
+                return await endpoint(*args, **endpoint_kwargs)
+            finally:
+                profile = current_profile.get()
+                if profile is not None:
+                    profile.endpoint_ms = (time.perf_counter() - started) * 1000
+        
+        super().__init__(path, timed_endpoint, **kwargs)
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def timed_handler(request: Request):
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                profile = current_profile.get()
+                if profile is not None:
+                    profile.route_ms = (time.perf_counter() - started) * 1000
+        
+        return timed_handler
+
+command_profiler = CommandProfiler()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[command_profiler])
 db = client[os.environ['DB_NAME']]
 
 # Twilio SMS Client
@@ -27,11 +189,38 @@ twilio_client = Client(
 )
 TWILIO_PHONE = os.environ.get('TWILIO_PHONE_NUMBER')
 
+# Appointment dates and times are entered in Turkey local time
+TURKEY_TZ = ZoneInfo("Europe/Istanbul")
+
+# SMS reminder scheduler
+REMINDER_POLL_SECONDS = int(os.environ.get('REMINDER_POLL_SECONDS', '60'))
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', '50'))
+REMINDER_SMS_PER_SECOND = float(os.environ.get('REMINDER_SMS_PER_SECOND', '1'))
+# Reminders that could not go out within this many minutes of their time are skipped instead of sent late
+REMINDER_GRACE_MINUTES = int(os.environ.get('REMINDER_GRACE_MINUTES', '60'))
+
+# How long a worker may serve free-slot queries from its cached day schedules
+AVAILABILITY_CACHE_SECONDS = int(os.environ.get('AVAILABILITY_CACHE_SECONDS', '30'))
+
+# Bookings of one day are serialized across workers through a Mongo lock document
+BOOKING_LOCK_SECONDS = int(os.environ.get('BOOKING_LOCK_SECONDS', '10'))
+BOOKING_LOCK_WAIT_SECONDS = float(os.environ.get('BOOKING_LOCK_WAIT_SECONDS', '5'))
+
+# Default window of appointments sent to the app on load, in days around today
+BOOTSTRAP_DAYS_BEFORE = int(os.environ.get('BOOTSTRAP_DAYS_BEFORE', '30'))
+BOOTSTRAP_DAYS_AFTER = int(os.environ.get('BOOTSTRAP_DAYS_AFTER', '60'))
+
+# Background jobs: a worker must renew a job's lease within JOB_LEASE_SECONDS to stay its leader
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '30'))
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3
+JOB_HISTORY_DAYS = int(os.environ.get('JOB_HISTORY_DAYS', '30'))
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
 # Create the main app without a prefix
 app = FastAPI()
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=ProfiledRoute)
 
 
 # SMS Helper Function
@@ -72,15 +261,18 @@ class Service(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     price: float
+    duration: int = Field(60, gt=0)  # minutes
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ServiceCreate(BaseModel):
     name: str
     price: float
+    duration: int = Field(60, gt=0)
 
 class ServiceUpdate(BaseModel):
     name: Optional[str] = None
     price: Optional[float] = None
+    duration: Optional[int] = Field(None, gt=0)
 
 class Appointment(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -93,6 +285,8 @@ class Appointment(BaseModel):
     service_price: float
     appointment_date: str  # YYYY-MM-DD
     appointment_time: str  # HH:MM
+    duration: Optional[int] = None  # minutes, None for appointments booked before durations existed
+    crew: int = 1
     notes: str = ""
     status: str = "Bekliyor"  # Bekliyor, Tamamlandı, İptal
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -105,6 +299,7 @@ class AppointmentCreate(BaseModel):
     service_id: str
     appointment_date: str
     appointment_time: str
+    crew: Optional[int] = None  # first free crew when not given
     notes: str = ""
 
 class AppointmentUpdate(BaseModel):
@@ -114,6 +309,7 @@ class AppointmentUpdate(BaseModel):
     service_id: Optional[str] = None
     appointment_date: Optional[str] = None
     appointment_time: Optional[str] = None
+    crew: Optional[int] = None
     notes: Optional[str] = None
     status: Optional[str] = None
 
@@ -133,9 +329,174 @@ class TransactionUpdate(BaseModel):
 class Settings(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = "app_settings"
-    work_start_hour: int = 7
-    work_end_hour: int = 3  # next day
-    appointment_interval: int = 30  # minutes
+    work_start_hour: int = Field(7, ge=0, le=23)
+    work_end_hour: int = Field(3, ge=0, le=23)  # next day
+    appointment_interval: int = Field(30, gt=0)  # minutes
+    crew_count: int = Field(1, ge=1)
+    reminder_offsets: List[int] = [1440, 120]  # minutes before appointment
+
+class Reminder(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    appointment_id: str
+    offset_minutes: int
+    appointment_date: str  # YYYY-MM-DD the reminder was scheduled for
+    appointment_time: str  # HH:MM the reminder was scheduled for
+    remind_at: datetime
+    status: str = "pending"  # pending, sending, sent, failed, skipped
+    sent_at: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class JobRun(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    job: str
+    worker: str
+    status: str = "running"  # running, success, failed, cancelled
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+
+class ProfilingSettings(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = "profiling_settings"
+    sample_rate: float = PROFILE_SAMPLE_RATE  # share of requests profiled without a valid X-Profile header
+    slow_request_ms: float = PROFILE_SLOW_REQUEST_MS
+    slow_command_ms: float = PROFILE_SLOW_COMMAND_MS
+    stack_sample_interval_ms: float = 5
+
+
+# Query Helpers
+def normalize_search(text: str) -> str:
+    """Lowercase text so Turkish and ASCII spellings of i/ı match each other"""
+    return text.replace('İ', 'i').replace('I', 'i').lower().replace('ı', 'i')
+
+# Bump when search_terms() changes so backfill_search_terms recomputes stored terms
+SEARCH_TERMS_VERSION = 2
+
+def search_terms(customer_name: str, phone: str) -> List[str]:
+    """Indexed search keys: every suffix of each name word and of the phone digits, so a prefix finds any part of them"""
+    words = normalize_search(customer_name).split() + [re.sub(r'\D', '', phone)]
+    return sorted({word[i:] for word in words for i in range(len(word))})
+
+def search_tokens(search: str) -> List[str]:
+    """Split a search into terms; phone numbers are reduced to the digits stored in search_terms"""
+    if re.fullmatch(r'[\d\s()+\-./]+', search) and re.search(r'\d', search):
+        # "0555 123-45-67" and "+90 555 ..." are one number, not separate terms
+        digits = re.sub(r'\D', '', search)
+        # Numbers are stored without the Turkish country code
+        if search.strip().startswith('+90') or (digits.startswith('90') and len(digits) == 12):
+            digits = digits[2:]
+        return [digits]
+    
+    tokens = []
+    for token in normalize_search(search).split():
+        if re.search(r'\d', token) and re.fullmatch(r'[\d()+\-./]+', token):
+            token = re.sub(r'\D', '', token)
+        tokens.append(token)
+    return tokens
+
+def appointments_query(
+    date: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> dict:
+    query = {}
+    if date:
+        query['appointment_date'] = date
+    elif start_date and end_date:
+        query['appointment_date'] = {'$gte': start_date, '$lte': end_date}
+    elif start_date:
+        query['appointment_date'] = {'$gte': start_date}
+    elif end_date:
+        query['appointment_date'] = {'$lte': end_date}
+    if status:
+        query['status'] = status
+    if search and search.split():
+        # Every term must be part of a name word or of the phone digits. Anchored prefixes on the stored
+        # suffixes walk the search_terms index, unlike a case-insensitive substring regex on the fields.
+        query['search_terms'] = {
+            '$all': [re.compile('^' + re.escape(term)) for term in search_tokens(search)]
+        }
+    return query
+
+def transactions_query(start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+    query = {}
+    if start_date and end_date:
+        query['date'] = {'$gte': start_date, '$lte': end_date}
+    elif start_date:
+        query['date'] = {'$gte': start_date}
+    elif end_date:
+        query['date'] = {'$lte': end_date}
+    return query
+
+def day_schedule_query(appointment_date: str) -> dict:
+    return {"appointment_date": appointment_date, "status": {"$ne": "İptal"}}
+
+def due_reminders_query(now: datetime) -> dict:
+    return {"status": "pending", "remind_at": {"$lte": now}}
+
+def upcoming_appointments_query(start_date: str) -> dict:
+    return {"status": "Bekliyor", "appointment_date": {"$gte": start_date}}
+
+
+# Indexes
+# Every filtered or sorted query above and in the routes below must be covered here;
+# tests/test_query_plans.py checks the plans against a seeded mongod.
+INDEXES = {
+    "services": [
+        IndexModel("id", unique=True)
+    ],
+    "appointments": [
+        IndexModel("id", unique=True),
+        IndexModel([("appointment_date", 1), ("status", 1)]),
+        IndexModel([("status", 1), ("appointment_date", -1)]),
+        IndexModel([("phone", 1), ("appointment_date", -1)]),
+        IndexModel("search_terms")
+    ],
+    "transactions": [
+        IndexModel("id", unique=True),
+        IndexModel("date")
+    ],
+    "settings": [
+        IndexModel("id", unique=True)
+    ],
+    "reminders": [
+        IndexModel("id", unique=True),
+        # Due reminders are found with a range query on remind_at instead of a collection scan
+        IndexModel([("status", 1), ("remind_at", 1)]),
+        IndexModel([("appointment_id", 1), ("offset_minutes", 1), ("remind_at", 1)], unique=True)
+    ],
+    "booking_locks": [
+        IndexModel("date", unique=True),
+        # Locks left behind by a crashed worker are removed by the TTL monitor
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ],
+    "job_leases": [
+        IndexModel("job", unique=True),
+        IndexModel("owner"),
+        # Expired leases are removed by the TTL monitor; acquire_lease also ignores them until then
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ],
+    "job_runs": [
+        IndexModel("id", unique=True),
+        IndexModel([("job", 1), ("started_at", -1)]),
+        # stop() marks the runs a worker leaves behind as cancelled
+        IndexModel([("worker", 1), ("status", 1)]),
+        IndexModel("started_at", expireAfterSeconds=JOB_HISTORY_DAYS * 24 * 60 * 60)
+    ],
+    "request_profiles": [
+        IndexModel("id"),
+        IndexModel([("created_at", -1)])
+    ],
+    "slow_log": [
+        IndexModel([("type", 1), ("created_at", -1)]),
+        IndexModel([("created_at", -1)])
+    ]
+}
 
 
 # Services Routes
@@ -195,28 +556,39 @@ async def create_appointment(appointment: AppointmentCreate):
     if not service:
         raise HTTPException(status_code=404, detail="Hizmet bulunamadı")
     
-    # Check if appointment already exists at the same date and time
-    existing = await db.appointments.find_one({
-        "appointment_date": appointment.appointment_date,
-        "appointment_time": appointment.appointment_time,
-        "status": {"$ne": "İptal"}  # Don't count cancelled appointments
-    })
-    
-    if existing:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"{appointment.appointment_date} tarihinde {appointment.appointment_time} saatinde zaten bir randevu var. Lütfen başka bir saat seçin."
-        )
-    
-    appointment_data = appointment.model_dump()
-    appointment_data['service_name'] = service['name']
-    appointment_data['service_price'] = service['price']
-    appointment_data['status'] = 'Bekliyor'
+    settings = await get_settings()
+    duration = service.get('duration') or settings.appointment_interval
     
-    appointment_obj = Appointment(**appointment_data)
-    doc = appointment_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.appointments.insert_one(doc)
+    # Check if a crew is free for the whole duration of the job, and book it before anyone else can
+    async with booking_lock(appointment.appointment_date):
+        crew = await find_free_crew(
+            appointment.appointment_date,
+            appointment.appointment_time,
+            duration,
+            settings,
+            crew=appointment.crew
+        )
+        
+        if crew is None:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"{appointment.appointment_date} tarihinde {appointment.appointment_time} saatinde zaten bir randevu var. Lütfen başka bir saat seçin."
+            )
+        
+        appointment_data = appointment.model_dump()
+        appointment_data['service_name'] = service['name']
+        appointment_data['service_price'] = service['price']
+        appointment_data['duration'] = duration
+        appointment_data['crew'] = crew
+        appointment_data['status'] = 'Bekliyor'
+        
+        appointment_obj = Appointment(**appointment_data)
+        doc = appointment_obj.model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        doc['search_terms'] = search_terms(doc['customer_name'], doc['phone'])
+        await db.appointments.insert_one(doc)
+    availability.book(doc, settings)
+    await schedule_reminders(doc, settings)
     
     # Send SMS notification
     sms_message = f"Royal Koltuk Yıkama - Randevunuz oluşturuldu!\n\nTarih: {appointment.appointment_date}\nSaat: {appointment.appointment_time}\nHizmet: {service['name']}\n\nBizi tercih ettiğiniz için teşekkür ederiz."
@@ -228,20 +600,17 @@ async def create_appointment(appointment: AppointmentCreate):
 async def get_appointments(
     date: Optional[str] = None,
     status: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
 ):
-    query = {}
-    if date:
-        query['appointment_date'] = date
-    if status:
-        query['status'] = status
-    if search:
-        query['$or'] = [
-            {'customer_name': {'$regex': search, '$options': 'i'}},
-            {'phone': {'$regex': search, '$options': 'i'}}
-        ]
-    
-    appointments = await db.appointments.find(query, {"_id": 0}).sort("appointment_date", -1).to_list(1000)
+    """`search` matches when every term is part of a customer name word or of the phone number;
+    case, ı/i spelling, phone formatting and a +90 prefix are ignored, but a term cannot span two words"""
+    query = appointments_query(date, status, search, start_date, end_date)
+    appointments = await db.appointments.find(
+        query,
+        {"_id": 0, "search_terms": 0}
+    ).sort("appointment_date", -1).to_list(1000)
     for appointment in appointments:
         if isinstance(appointment['created_at'], str):
             appointment['created_at'] = datetime.fromisoformat(appointment['created_at'])
@@ -264,24 +633,13 @@ async def update_appointment(appointment_id: str, appointment_update: Appointmen
     
     update_data = {k: v for k, v in appointment_update.model_dump().items() if v is not None}
     
-    # Check if date/time changed and if there's a conflict
-    if 'appointment_date' in update_data or 'appointment_time' in update_data:
-        check_date = update_data.get('appointment_date', appointment['appointment_date'])
-        check_time = update_data.get('appointment_time', appointment['appointment_time'])
-        
-        # Check if another appointment exists at this time (excluding current appointment and cancelled ones)
-        existing = await db.appointments.find_one({
-            "id": {"$ne": appointment_id},
-            "appointment_date": check_date,
-            "appointment_time": check_time,
-            "status": {"$ne": "İptal"}
-        })
-        
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"{check_date} tarihinde {check_time} saatinde zaten bir randevu var. Lütfen başka bir saat seçin."
-            )
+    settings = await get_settings()
+    
+    if 'customer_name' in update_data or 'phone' in update_data:
+        update_data['search_terms'] = search_terms(
+            update_data.get('customer_name', appointment['customer_name']),
+            update_data.get('phone', appointment['phone'])
+        )
     
     # If service_id changed, update service details
     if 'service_id' in update_data:
@@ -289,36 +647,79 @@ async def update_appointment(appointment_id: str, appointment_update: Appointmen
         if service:
             update_data['service_name'] = service['name']
             update_data['service_price'] = service['price']
+            update_data['duration'] = service.get('duration') or settings.appointment_interval
     
-    # If status changed to Tamamlandı, add to transactions and set completed_at
-    if update_data.get('status') == 'Tamamlandı' and appointment['status'] != 'Tamamlandı':
-        update_data['completed_at'] = datetime.now(timezone.utc).isoformat()
-        
-        # Create transaction
-        transaction = Transaction(
-            appointment_id=appointment_id,
-            customer_name=appointment['customer_name'],
-            service_name=appointment['service_name'],
-            amount=appointment['service_price'],
-            date=appointment['appointment_date']
-        )
-        trans_doc = transaction.model_dump()
-        trans_doc['created_at'] = trans_doc['created_at'].isoformat()
-        await db.transactions.insert_one(trans_doc)
+    # Check if the new slot, crew or duration conflicts with another appointment (cancelled ones never block)
+    new_status = update_data.get('status', appointment['status'])
+    reactivated = appointment['status'] == 'İptal' and new_status != 'İptal'
+    needs_check = new_status != 'İptal' and (
+        reactivated or {'appointment_date', 'appointment_time', 'duration', 'crew'} & update_data.keys()
+    )
+    check_date = update_data.get('appointment_date', appointment['appointment_date'])
     
-    if update_data:
-        await db.appointments.update_one({"id": appointment_id}, {"$set": update_data})
+    # The check and the write happen under the day's lock so a concurrent booking cannot slip in between
+    async with booking_lock(check_date) if needs_check else contextlib.nullcontext():
+        if needs_check:
+            check_time = update_data.get('appointment_time', appointment['appointment_time'])
+            check_duration = update_data.get('duration', appointment.get('duration') or settings.appointment_interval)
+            
+            crew = await find_free_crew(
+                check_date,
+                check_time,
+                check_duration,
+                settings,
+                crew=update_data.get('crew'),
+                preferred_crew=appointment.get('crew', 1),
+                exclude_id=appointment_id
+            )
+            
+            if crew is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{check_date} tarihinde {check_time} saatinde zaten bir randevu var. Lütfen başka bir saat seçin."
+                )
+            update_data['crew'] = crew
+        
+        # If status changed to Tamamlandı, add to transactions and set completed_at
+        if update_data.get('status') == 'Tamamlandı' and appointment['status'] != 'Tamamlandı':
+            update_data['completed_at'] = datetime.now(timezone.utc).isoformat()
+            
+            # Create transaction
+            transaction = Transaction(
+                appointment_id=appointment_id,
+                customer_name=appointment['customer_name'],
+                service_name=appointment['service_name'],
+                amount=appointment['service_price'],
+                date=appointment['appointment_date']
+            )
+            trans_doc = transaction.model_dump()
+            trans_doc['created_at'] = trans_doc['created_at'].isoformat()
+            await db.transactions.insert_one(trans_doc)
+        
+        if update_data:
+            await db.appointments.update_one({"id": appointment_id}, {"$set": update_data})
     
     updated_appointment = await db.appointments.find_one({"id": appointment_id}, {"_id": 0})
+    availability.release(appointment)
+    if updated_appointment['status'] != 'İptal':
+        availability.book(updated_appointment, settings)
+    
+    # Rescheduled or cancelled appointments must not get reminders for the old slot
+    if {'appointment_date', 'appointment_time', 'status'} & update_data.keys():
+        await cancel_reminders(appointment_id)
+        await schedule_reminders(updated_appointment, settings)
+    
     if isinstance(updated_appointment['created_at'], str):
         updated_appointment['created_at'] = datetime.fromisoformat(updated_appointment['created_at'])
     return updated_appointment
 
 @api_router.delete("/appointments/{appointment_id}")
 async def delete_appointment(appointment_id: str):
-    result = await db.appointments.delete_one({"id": appointment_id})
-    if result.deleted_count == 0:
+    appointment = await db.appointments.find_one_and_delete({"id": appointment_id}, {"_id": 0})
+    if not appointment:
         raise HTTPException(status_code=404, detail="Randevu bulunamadı")
+    availability.release(appointment)
+    await cancel_reminders(appointment_id)
     return {"message": "Randevu silindi"}
 
 
@@ -328,14 +729,7 @@ async def get_transactions(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None
 ):
-    query = {}
-    if start_date and end_date:
-        query['date'] = {'$gte': start_date, '$lte': end_date}
-    elif start_date:
-        query['date'] = {'$gte': start_date}
-    elif end_date:
-        query['date'] = {'$lte': end_date}
-    
+    query = transactions_query(start_date, end_date)
     transactions = await db.transactions.find(query, {"_id": 0}).sort("date", -1).to_list(1000)
     for transaction in transactions:
         if isinstance(transaction['created_at'], str):
@@ -369,50 +763,36 @@ async def delete_transaction(transaction_id: str):
 # Dashboard Stats
 @api_router.get("/stats/dashboard")
 async def get_dashboard_stats():
-    from datetime import date, timedelta
-    from zoneinfo import ZoneInfo
-    
-    # Use Turkey timezone
-    turkey_tz = ZoneInfo("Europe/Istanbul")
-    today = datetime.now(turkey_tz).date().isoformat()
-    
-    # Today's appointments
-    today_appointments = await db.appointments.count_documents({
-        "appointment_date": today
-    })
-    
-    # Today's completed
-    today_completed = await db.appointments.count_documents({
-        "appointment_date": today,
-        "status": "Tamamlandı"
-    })
-    
-    # Today's income
-    today_transactions = await db.transactions.find({"date": today}, {"_id": 0}).to_list(1000)
-    today_income = sum(t['amount'] for t in today_transactions)
-    
-    # Week income (last 7 days)
-    week_start = (datetime.now(turkey_tz).date() - timedelta(days=7)).isoformat()
-    week_transactions = await db.transactions.find(
-        {"date": {"$gte": week_start}},
-        {"_id": 0}
-    ).to_list(1000)
-    week_income = sum(t['amount'] for t in week_transactions)
+    today_date = datetime.now(TURKEY_TZ).date()
+    today = today_date.isoformat()
+    week_start = (today_date - timedelta(days=7)).isoformat()
+    month_start = today_date.replace(day=1).isoformat()
     
-    # Month income
-    month_start = datetime.now(turkey_tz).date().replace(day=1).isoformat()
-    month_transactions = await db.transactions.find(
-        {"date": {"$gte": month_start}},
-        {"_id": 0}
-    ).to_list(1000)
-    month_income = sum(t['amount'] for t in month_transactions)
+    (
+        today_appointments,
+        today_completed,
+        today_transactions,
+        week_transactions,
+        month_transactions
+    ) = await asyncio.gather(
+        # Today's appointments
+        db.appointments.count_documents({"appointment_date": today}),
+        # Today's completed
+        db.appointments.count_documents({"appointment_date": today, "status": "Tamamlandı"}),
+        # Today's income
+        db.transactions.find({"date": today}, {"_id": 0, "amount": 1}).to_list(1000),
+        # Week income (last 7 days)
+        db.transactions.find({"date": {"$gte": week_start}}, {"_id": 0, "amount": 1}).to_list(1000),
+        # Month income
+        db.transactions.find({"date": {"$gte": month_start}}, {"_id": 0, "amount": 1}).to_list(1000)
+    )
     
     return {
         "today_appointments": today_appointments,
         "today_completed": today_completed,
-        "today_income": today_income,
-        "week_income": week_income,
-        "month_income": month_income
+        "today_income": sum(t['amount'] for t in today_transactions),
+        "week_income": sum(t['amount'] for t in week_transactions),
+        "month_income": sum(t['amount'] for t in month_transactions)
     }
 
 
@@ -423,7 +803,10 @@ async def get_settings():
     if not settings:
         # Create default settings
         default_settings = Settings()
-        await db.settings.insert_one(default_settings.model_dump())
+        try:
+            await db.settings.insert_one(default_settings.model_dump())
+        except DuplicateKeyError:
+            pass  # created by a concurrent request
         return default_settings
     return Settings(**settings)
 
@@ -434,6 +817,8 @@ async def update_settings(settings: Settings):
         {"$set": settings.model_dump()},
         upsert=True
     )
+    # Working hours, interval and crew count all change how cached schedules are laid out
+    availability.clear()
     return settings
 
 
@@ -442,7 +827,7 @@ async def update_settings(settings: Settings):
 async def get_customer_history(phone: str):
     appointments = await db.appointments.find(
         {"phone": phone},
-        {"_id": 0}
+        {"_id": 0, "search_terms": 0}
     ).sort("appointment_date", -1).to_list(1000)
     
     for appointment in appointments:
@@ -459,9 +844,700 @@ async def get_customer_history(phone: str):
     }
 
 
+# Bootstrap
+@api_router.get("/bootstrap")
+async def get_bootstrap(days_before: int = BOOTSTRAP_DAYS_BEFORE, days_after: int = BOOTSTRAP_DAYS_AFTER):
+    """Everything the app needs on load, fetched concurrently in one round-trip"""
+    today = datetime.now(TURKEY_TZ).date()
+    start_date = (today - timedelta(days=days_before)).isoformat()
+    end_date = (today + timedelta(days=days_after)).isoformat()
+    
+    services, appointments, stats, settings = await asyncio.gather(
+        get_services(),
+        get_appointments(start_date=start_date, end_date=end_date),
+        get_dashboard_stats(),
+        get_settings()
+    )
+    
+    return {
+        "services": services,
+        "appointments": appointments,
+        "appointments_window": {"start_date": start_date, "end_date": end_date},
+        "stats": stats,
+        "settings": settings
+    }
+
+
+# Availability
+def slot_minutes(appointment_time: str, settings: Settings) -> int:
+    """Minutes since the start of the working day's calendar date for an HH:MM time"""
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', appointment_time or '')
+    if not match or int(match[1]) > 23 or int(match[2]) > 59:
+        raise ValueError(f"Invalid appointment time: {appointment_time!r}")
+    hour, minute = int(match[1]), int(match[2])
+    minutes = hour * 60 + minute
+    # When the shop works past midnight, early-morning slots belong to the previous evening's shift
+    if settings.work_end_hour < settings.work_start_hour and hour < settings.work_start_hour:
+        minutes += 24 * 60
+    return minutes
+
+def working_slots(settings: Settings) -> List[str]:
+    """Bookable HH:MM start times, matching the slots the appointment form offers"""
+    start = settings.work_start_hour * 60
+    end = settings.work_end_hour * 60
+    if settings.work_end_hour < settings.work_start_hour:
+        end += 24 * 60
+    
+    slots = []
+    for minutes in range(start, end + 1, settings.appointment_interval):
+        minutes %= 24 * 60
+        slots.append(f"{minutes // 60:02d}:{minutes % 60:02d}")
+    return slots
+
+class CrewSchedule:
+    """Booked intervals of one crew on one day, kept sorted by start minute"""
+    
+    def __init__(self):
+        self.starts: List[int] = []
+        self.bookings: List[tuple] = []  # (start, end, appointment_id)
+        # max_ends[i] is the latest end among bookings[:i + 1]; legacy data may hold overlapping bookings
+        self.max_ends: List[int] = []
+    
+    def add(self, start: int, end: int, appointment_id: str):
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.bookings.insert(index, (start, end, appointment_id))
+        self.max_ends.insert(index, end)
+        self.update_max_ends(index)
+    
+    def remove(self, appointment_id: str):
+        for index, booking in enumerate(self.bookings):
+            if booking[2] == appointment_id:
+                del self.starts[index]
+                del self.bookings[index]
+                del self.max_ends[index]
+                self.update_max_ends(index)
+                return
+    
+    def update_max_ends(self, index: int):
+        latest = self.max_ends[index - 1] if index > 0 else 0
+        for i in range(index, len(self.bookings)):
+            latest = max(latest, self.bookings[i][1])
+            self.max_ends[i] = latest
+    
+    def conflict(self, start: int, end: int, exclude_id: Optional[str] = None) -> Optional[str]:
+        """Return the id of a booking overlapping [start, end), if any"""
+        # Walk back from the last booking starting before `end` until nothing earlier can reach `start`
+        index = bisect.bisect_left(self.starts, end)
+        while index > 0 and self.max_ends[index - 1] > start:
+            index -= 1
+            booking_start, booking_end, booking_id = self.bookings[index]
+            if booking_end > start and booking_id != exclude_id:
+                return booking_id
+        return None
+
+class AvailabilityIndex:
+    """Per-day, per-crew interval schedules so overlap checks only touch one day's bookings"""
+    
+    def __init__(self):
+        self.days: Dict[str, Dict[int, CrewSchedule]] = {}
+        self.loaded_at: Dict[str, float] = {}
+    
+    async def get_day(self, appointment_date: str, settings: Settings, fresh: bool = False) -> Dict[int, CrewSchedule]:
+        """Load a day's schedules from Mongo unless a recent cached copy can be used"""
+        self.evict_expired()
+        loaded_at = self.loaded_at.get(appointment_date)
+        if not fresh and loaded_at is not None and time.monotonic() - loaded_at < AVAILABILITY_CACHE_SECONDS:
+            return self.days[appointment_date]
+        
+        appointments = await db.appointments.find(
+            day_schedule_query(appointment_date),
+            {"_id": 0, "id": 1, "appointment_date": 1, "appointment_time": 1, "duration": 1, "crew": 1}
+        ).to_list(None)
+        
+        self.days[appointment_date] = {}
+        self.loaded_at[appointment_date] = time.monotonic()
+        for appointment in appointments:
+            self.book(appointment, settings)
+        return self.days[appointment_date]
+    
+    def book(self, appointment: dict, settings: Settings):
+        day = self.days.get(appointment['appointment_date'])
+        if day is None:
+            return  # not cached, the next get_day loads it from Mongo
+        
+        try:
+            start = slot_minutes(appointment['appointment_time'], settings)
+        except ValueError:
+            logging.warning(f"Appointment {appointment['id']} has an invalid time and does not block any slot")
+            return
+        end = start + (appointment.get('duration') or settings.appointment_interval)
+        day.setdefault(appointment.get('crew', 1), CrewSchedule()).add(start, end, appointment['id'])
+    
+    def release(self, appointment: dict):
+        day = self.days.get(appointment['appointment_date'])
+        if day is not None and appointment.get('crew', 1) in day:
+            day[appointment.get('crew', 1)].remove(appointment['id'])
+    
+    def evict_expired(self):
+        """Forget days that are too old to be served, so the cache only holds recently queried days"""
+        now = time.monotonic()
+        for appointment_date in [d for d, loaded_at in self.loaded_at.items() if now - loaded_at >= AVAILABILITY_CACHE_SECONDS]:
+            del self.days[appointment_date]
+            del self.loaded_at[appointment_date]
+    
+    def clear(self):
+        self.days.clear()
+        self.loaded_at.clear()
+
+availability = AvailabilityIndex()
+
+@contextlib.asynccontextmanager
+async def booking_lock(appointment_date: str):
+    """Hold the day's lock across workers while checking for conflicts and writing the booking"""
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + BOOKING_LOCK_WAIT_SECONDS
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.booking_locks.update_one(
+                {"date": appointment_date, "expires_at": {"$lt": now}},
+                {"$set": {"token": token, "expires_at": now + timedelta(seconds=BOOKING_LOCK_SECONDS)}},
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            # Another booking of the same day holds the lock
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Bu gün için başka bir randevu kaydediliyor. Lütfen tekrar deneyin."
+                )
+            await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        await db.booking_locks.delete_one({"date": appointment_date, "token": token})
+
+async def find_free_crew(
+    appointment_date: str,
+    appointment_time: str,
+    duration: int,
+    settings: Settings,
+    crew: Optional[int] = None,
+    preferred_crew: Optional[int] = None,
+    exclude_id: Optional[str] = None
+) -> Optional[int]:
+    """Pick a crew that is free for the whole job, or None if every candidate is busy"""
+    if crew is not None and not 1 <= crew <= settings.crew_count:
+        raise HTTPException(status_code=400, detail=f"Geçersiz ekip: {crew}")
+    try:
+        start = slot_minutes(appointment_time, settings)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Geçersiz saat: {appointment_time}")
+    end = start + duration
+    
+    # Checked against fresh data; callers hold booking_lock so the result stays valid until they write
+    day = await availability.get_day(appointment_date, settings, fresh=True)
+    
+    if crew is not None:
+        candidates = [crew]
+    else:
+        candidates = list(range(1, settings.crew_count + 1))
+        if preferred_crew in candidates:
+            candidates.remove(preferred_crew)
+            candidates.insert(0, preferred_crew)
+    
+    for candidate in candidates:
+        schedule = day.get(candidate)
+        if schedule is None or schedule.conflict(start, end, exclude_id) is None:
+            return candidate
+    return None
+
+@api_router.get("/availability")
+async def get_availability(date: str, service_id: Optional[str] = None, exclude_id: Optional[str] = None):
+    settings = await get_settings()
+    duration = settings.appointment_interval
+    if service_id:
+        service = await db.services.find_one({"id": service_id}, {"_id": 0})
+        if not service:
+            raise HTTPException(status_code=404, detail="Hizmet bulunamadı")
+        duration = service.get('duration') or settings.appointment_interval
+    
+    day = await availability.get_day(date, settings)
+    slots = []
+    for slot in working_slots(settings):
+        start = slot_minutes(slot, settings)
+        free_crews = [
+            crew for crew in range(1, settings.crew_count + 1)
+            if crew not in day or day[crew].conflict(start, start + duration, exclude_id) is None
+        ]
+        slots.append({"time": slot, "available_crews": free_crews})
+    
+    return {
+        "date": date,
+        "duration": duration,
+        "slots": slots
+    }
+
+
+# SMS Reminders
+def appointment_start(appointment_date: str, appointment_time: str, settings: Settings) -> datetime:
+    """Convert an appointment's local date and time to a UTC datetime"""
+    # Same shift as the schedules: after-midnight slots are the night after appointment_date
+    day_start = datetime.strptime(appointment_date, "%Y-%m-%d").replace(tzinfo=TURKEY_TZ)
+    local_start = day_start + timedelta(minutes=slot_minutes(appointment_time, settings))
+    return local_start.astimezone(timezone.utc)
+
+async def schedule_reminders(appointment: dict, settings: Optional[Settings] = None):
+    """Create pending reminders for each configured offset that is still in the future"""
+    if appointment['status'] != 'Bekliyor':
+        return
+    
+    if settings is None:
+        settings = await get_settings()
+    try:
+        start = appointment_start(appointment['appointment_date'], appointment['appointment_time'], settings)
+    except ValueError:
+        logging.warning(f"Cannot schedule reminders for appointment {appointment['id']}: invalid date/time")
+        return
+    
+    now = datetime.now(timezone.utc)
+    for offset in settings.reminder_offsets:
+        remind_at = start - timedelta(minutes=offset)
+        if remind_at <= now:
+            continue
+        
+        reminder = Reminder(
+            appointment_id=appointment['id'],
+            offset_minutes=offset,
+            appointment_date=appointment['appointment_date'],
+            appointment_time=appointment['appointment_time'],
+            remind_at=remind_at
+        )
+        doc = reminder.model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        # Upsert on the unique key so a reminder that was already sent for this slot is never recreated
+        await db.reminders.update_one(
+            {"appointment_id": appointment['id'], "offset_minutes": offset, "remind_at": remind_at},
+            {"$setOnInsert": doc},
+            upsert=True
+        )
+
+async def cancel_reminders(appointment_id: str):
+    """Drop reminders of an appointment that have not been sent yet"""
+    await db.reminders.delete_many({"appointment_id": appointment_id, "status": "pending"})
+
+def reminder_slot_passed(appointment: dict, settings: Settings, now: datetime) -> bool:
+    try:
+        return appointment_start(appointment['appointment_date'], appointment['appointment_time'], settings) <= now
+    except ValueError:
+        return True
+
+async def reminder_stale(reminder: dict, now: datetime) -> bool:
+    """True for a reminder that is too late to be useful after downtime or a long backlog"""
+    if now - as_utc(reminder['remind_at']) > timedelta(minutes=REMINDER_GRACE_MINUTES):
+        return True
+    # A closer reminder of the same appointment is already due, so this one would arrive right before it
+    closer = await db.reminders.find_one(
+        {
+            "appointment_id": reminder['appointment_id'],
+            "offset_minutes": {"$lt": reminder['offset_minutes']},
+            "remind_at": {"$lte": now}
+        },
+        {"_id": 0, "id": 1}
+    )
+    return closer is not None
+
+async def dispatch_due_reminders() -> int:
+    """Send one batch of due reminders and return how many were picked up"""
+    settings = await get_settings()
+    now = datetime.now(timezone.utc)
+    due_reminders = await db.reminders.find(
+        due_reminders_query(now),
+        {"_id": 0}
+    ).sort("remind_at", 1).to_list(REMINDER_BATCH_SIZE)
+    
+    for reminder in due_reminders:
+        # Claim the reminder first so it is sent at most once
+        claimed = await db.reminders.find_one_and_update(
+            {"id": reminder['id'], "status": "pending"},
+            {"$set": {"status": "sending", "claimed_at": datetime.now(timezone.utc)}}
+        )
+        if not claimed:
+            continue
+        
+        appointment = await db.appointments.find_one({"id": reminder['appointment_id']}, {"_id": 0})
+        if (
+            not appointment
+            or appointment['status'] != 'Bekliyor'
+            or appointment['appointment_date'] != reminder['appointment_date']
+            or appointment['appointment_time'] != reminder['appointment_time']
+            or reminder_slot_passed(appointment, settings, now)
+            or await reminder_stale(reminder, now)
+        ):
+            await db.reminders.update_one({"id": reminder['id']}, {"$set": {"status": "skipped"}})
+            continue
+        
+        sms_message = f"Royal Koltuk Yıkama - Randevu hatırlatması\n\nTarih: {appointment['appointment_date']}\nSaat: {appointment['appointment_time']}\nHizmet: {appointment['service_name']}\n\nSizi bekliyoruz."
+        sent = await asyncio.to_thread(send_sms, appointment['phone'], sms_message)
+        await db.reminders.update_one(
+            {"id": reminder['id']},
+            {"$set": {
+                "status": "sent" if sent else "failed",
+                "sent_at": datetime.now(timezone.utc).isoformat() if sent else None
+            }}
+        )
+        
+        # Stay under the SMS provider's rate limit
+        await asyncio.sleep(1 / REMINDER_SMS_PER_SECOND)
+    
+    return len(due_reminders)
+
+
+# Background Jobs
+def as_utc(value: datetime) -> datetime:
+    """Mongo returns naive UTC datetimes, make them comparable with aware ones"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class PeriodicJob:
+    def __init__(self, name: str, interval_seconds: int, func: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+
+class JobRunner:
+    """Runs periodic jobs on exactly one worker, elected through TTL-indexed Mongo leases"""
+    
+    def __init__(self):
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self.tasks: List[asyncio.Task] = []
+    
+    def periodic(self, name: str, interval_seconds: int):
+        def register(func: Callable[[], Awaitable[None]]):
+            self.jobs[name] = PeriodicJob(name, interval_seconds, func)
+            return func
+        return register
+    
+    async def acquire_lease(self, name: str) -> bool:
+        """Take over or renew a job's lease; False while another worker holds a live lease"""
+        now = datetime.now(timezone.utc)
+        try:
+            await db.job_leases.find_one_and_update(
+                {"job": name, "$or": [{"owner": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The upsert collided with the live lease of another worker
+            return False
+        return True
+    
+    async def is_due(self, job: PeriodicJob) -> bool:
+        # Run history is shared, so a new leader picks up the previous leader's schedule
+        last_run = await db.job_runs.find_one({"job": job.name}, {"_id": 0, "started_at": 1}, sort=[("started_at", -1)])
+        if not last_run:
+            return True
+        return as_utc(last_run['started_at']) + timedelta(seconds=job.interval_seconds) <= datetime.now(timezone.utc)
+    
+    async def heartbeat(self, name: str, job_task: asyncio.Task):
+        """Renew the lease while the job runs; cancel the job as soon as this worker is no longer its leader"""
+        renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                if not await self.acquire_lease(name):
+                    logging.warning(f"Job {name} lost its lease on {WORKER_ID}, cancelling it")
+                    job_task.cancel()
+                    return
+                renewed = time.monotonic()
+            except Exception as e:
+                # Another worker may take over once the lease runs out, so stop before it does
+                if time.monotonic() - renewed + JOB_HEARTBEAT_SECONDS >= JOB_LEASE_SECONDS:
+                    logging.warning(f"Job {name} could not renew its lease on {WORKER_ID}, cancelling it: {str(e)}")
+                    job_task.cancel()
+                    return
+    
+    async def finish_run(self, run: JobRun, status: str, error: Optional[str], started: float):
+        await db.job_runs.update_one(
+            {"id": run.id},
+            {"$set": {
+                "status": status,
+                "error": error,
+                "finished_at": datetime.now(timezone.utc),
+                "duration_ms": (time.perf_counter() - started) * 1000
+            }}
+        )
+    
+    async def run_once(self, job: PeriodicJob):
+        run = JobRun(job=job.name, worker=WORKER_ID)
+        await db.job_runs.insert_one(run.model_dump())
+        
+        # Keep the lease alive for jobs that outlast it
+        job_task = asyncio.create_task(job.func())
+        heartbeat = asyncio.create_task(self.heartbeat(job.name, job_task))
+        started = time.perf_counter()
+        status, error = "success", None
+        try:
+            await job_task
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                # run_once itself was cancelled by stop(), which records the run once the job has unwound
+                heartbeat.cancel()
+                job_task.cancel()
+                await asyncio.gather(job_task, return_exceptions=True)
+                raise
+            status, error = "cancelled", "lease lost"
+        except Exception as e:
+            status, error = "failed", str(e)
+            logging.error(f"Job {job.name} failed: {str(e)}")
+        finally:
+            heartbeat.cancel()
+        
+        await self.finish_run(run, status, error, started)
+    
+    async def run_loop(self, job: PeriodicJob):
+        while True:
+            try:
+                if await self.acquire_lease(job.name) and await self.is_due(job):
+                    await self.run_once(job)
+            except Exception as e:
+                logging.error(f"Job {job.name} scheduling failed: {str(e)}")
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+    
+    def start(self):
+        self.tasks = [asyncio.create_task(self.run_loop(job)) for job in self.jobs.values()]
+    
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        # Let running jobs unwind and record their runs before the leases go
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        await db.job_runs.update_many(
+            {"worker": WORKER_ID, "status": "running"},
+            {"$set": {"status": "cancelled", "error": "worker shutting down", "finished_at": datetime.now(timezone.utc)}}
+        )
+        # Hand the leases over right away instead of letting them expire
+        await db.job_leases.delete_many({"owner": WORKER_ID})
+
+job_runner = JobRunner()
+
+@job_runner.periodic("send_reminders", REMINDER_POLL_SECONDS)
+async def send_reminders():
+    # A full batch means more reminders may already be due
+    while await dispatch_due_reminders() == REMINDER_BATCH_SIZE:
+        pass
+
+@job_runner.periodic("sync_reminders", 60)
+async def sync_reminders():
+    # Schedules appointments booked before reminders existed, and reschedules them when the offsets change
+    settings = await get_settings()
+    synced = await db.settings.find_one({"id": "reminder_sync"}, {"_id": 0})
+    if synced and synced['reminder_offsets'] == settings.reminder_offsets:
+        return
+    
+    # Night slots of yesterday's shift can still be ahead
+    start_date = (datetime.now(TURKEY_TZ).date() - timedelta(days=1)).isoformat()
+    appointments = await db.appointments.find(
+        upcoming_appointments_query(start_date),
+        {"_id": 0, "id": 1, "status": 1, "appointment_date": 1, "appointment_time": 1}
+    ).to_list(None)
+    for appointment in appointments:
+        await db.reminders.delete_many({
+            "appointment_id": appointment['id'],
+            "status": "pending",
+            "offset_minutes": {"$nin": settings.reminder_offsets}
+        })
+        await schedule_reminders(appointment, settings)
+    
+    await db.settings.update_one(
+        {"id": "reminder_sync"},
+        {"$set": {"id": "reminder_sync", "reminder_offsets": settings.reminder_offsets}},
+        upsert=True
+    )
+
+@job_runner.periodic("expire_stuck_reminders", 15 * 60)
+async def expire_stuck_reminders():
+    # A worker that died mid-send leaves its claim behind; never resend, just record the failure
+    await db.reminders.update_many(
+        {"status": "sending", "claimed_at": {"$lt": datetime.now(timezone.utc) - timedelta(minutes=15)}},
+        {"$set": {"status": "failed"}}
+    )
+
+@job_runner.periodic("backfill_search_terms", 60 * 60)
+async def backfill_search_terms():
+    # Appointments created before search_terms existed are not found by the search filter until backfilled,
+    # and every appointment is recomputed once after search_terms() changes
+    synced = await db.settings.find_one({"id": "search_terms_sync"}, {"_id": 0})
+    outdated = not synced or synced['version'] != SEARCH_TERMS_VERSION
+    appointments = await db.appointments.find(
+        {} if outdated else {"search_terms": {"$exists": False}},
+        {"_id": 0, "id": 1, "customer_name": 1, "phone": 1}
+    ).to_list(None)
+    for appointment in appointments:
+        await db.appointments.update_one(
+            {"id": appointment['id']},
+            {"$set": {"search_terms": search_terms(appointment['customer_name'], appointment['phone'])}}
+        )
+    
+    if outdated:
+        await db.settings.update_one(
+            {"id": "search_terms_sync"},
+            {"$set": {"id": "search_terms_sync", "version": SEARCH_TERMS_VERSION}},
+            upsert=True
+        )
+
+@api_router.get("/jobs")
+async def get_jobs():
+    now = datetime.now(timezone.utc)
+    leases = {
+        lease['job']: lease
+        for lease in await db.job_leases.find({"expires_at": {"$gte": now}}, {"_id": 0}).to_list(100)
+    }
+    
+    jobs = []
+    for job in job_runner.jobs.values():
+        runs = await db.job_runs.find({"job": job.name}, {"_id": 0}).sort("started_at", -1).to_list(20)
+        durations = [run['duration_ms'] for run in runs if run.get('duration_ms') is not None]
+        lease = leases.get(job.name)
+        jobs.append({
+            "name": job.name,
+            "interval_seconds": job.interval_seconds,
+            "leader": lease['owner'] if lease else None,
+            "lease_expires_at": lease['expires_at'] if lease else None,
+            "last_run": runs[0] if runs else None,
+            "avg_duration_ms": sum(durations) / len(durations) if durations else None,
+            "max_duration_ms": max(durations) if durations else None
+        })
+    
+    return {"worker": WORKER_ID, "jobs": jobs}
+
+@api_router.get("/jobs/{job_name}/runs", response_model=List[JobRun])
+async def get_job_runs(job_name: str, limit: int = 50):
+    if job_name not in job_runner.jobs:
+        raise HTTPException(status_code=404, detail="Görev bulunamadı")
+    return await db.job_runs.find({"job": job_name}, {"_id": 0}).sort("started_at", -1).to_list(limit)
+
+
+# Profiling
+profiling_cache = {"settings": ProfilingSettings(), "loaded_at": None}
+
+async def get_profiling_settings() -> ProfilingSettings:
+    """Profiling settings shared by all workers, re-read from Mongo every 10 seconds"""
+    loaded_at = profiling_cache['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at >= 10:
+        settings = await db.settings.find_one({"id": "profiling_settings"}, {"_id": 0})
+        profiling_cache['settings'] = ProfilingSettings(**settings) if settings else ProfilingSettings()
+        profiling_cache['loaded_at'] = time.monotonic()
+        command_profiler.slow_command_ms = profiling_cache['settings'].slow_command_ms
+    return profiling_cache['settings']
+
+@api_router.get("/profiling", response_model=ProfilingSettings)
+async def get_profiling():
+    return await get_profiling_settings()
+
+@api_router.put("/profiling", response_model=ProfilingSettings)
+async def update_profiling(settings: ProfilingSettings):
+    await db.settings.update_one(
+        {"id": "profiling_settings"},
+        {"$set": settings.model_dump()},
+        upsert=True
+    )
+    profiling_cache['settings'] = settings
+    profiling_cache['loaded_at'] = time.monotonic()
+    command_profiler.slow_command_ms = settings.slow_command_ms
+    return settings
+
+@api_router.get("/profiling/profiles")
+async def get_request_profiles(limit: int = 20):
+    return await db.request_profiles.find({}, {"_id": 0}).sort("created_at", -1).to_list(limit)
+
+@api_router.get("/profiling/profiles/{profile_id}")
+async def get_request_profile(profile_id: str):
+    profile = await db.request_profiles.find_one({"id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profil bulunamadı")
+    return profile
+
+@api_router.get("/profiling/slow")
+async def get_slow_log(type: Optional[str] = None, limit: int = 50):
+    query = {}
+    if type:
+        query['type'] = type
+    return await db.slow_log.find(query, {"_id": 0}).sort("created_at", -1).to_list(limit)
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
+def profile_requested(request: Request) -> bool:
+    """Only clients that know PROFILE_HEADER_TOKEN may start stack sampling for their request"""
+    header = request.headers.get("x-profile")
+    return bool(PROFILE_HEADER_TOKEN) and header is not None and hmac.compare_digest(header.encode(), PROFILE_HEADER_TOKEN.encode())
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    
+    settings = await get_profiling_settings()
+    profile = RequestProfile()
+    token = current_profile.set(profile)
+    if profile_requested(request) or random.random() < settings.sample_rate:
+        profile.sampler = StackSampler(threading.get_ident(), settings.stack_sample_interval_ms)
+        profile.sampler.start()
+    
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        if profile.sampler is not None:
+            profile.sampler.stop()
+        current_profile.reset(token)
+    total_ms = (time.perf_counter() - started) * 1000
+    
+    breakdown = {
+        "method": request.method,
+        "path": request.url.path,
+        "query": str(request.query_params),
+        "status_code": response.status_code,
+        "total_ms": total_ms,
+        "route_ms": profile.route_ms,
+        "endpoint_ms": profile.endpoint_ms,
+        "validation_serialization_ms": (
+            profile.route_ms - profile.endpoint_ms
+            if profile.route_ms is not None and profile.endpoint_ms is not None else None
+        ),
+        "mongo_ms": profile.mongo_ms,
+        "mongo_commands": profile.commands,
+        "worker": WORKER_ID,
+        "created_at": datetime.now(timezone.utc)
+    }
+    
+    if profile.sampler is not None:
+        profile_id = str(uuid.uuid4())
+        await db.request_profiles.insert_one({"id": profile_id, **breakdown, "stacks": profile.sampler.top()})
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={value:.1f}"
+            for name, value in (
+                ("total", total_ms),
+                ("mongo", profile.mongo_ms),
+                ("endpoint", profile.endpoint_ms),
+                ("serialization", breakdown['validation_serialization_ms'])
+            )
+            if value is not None
+        )
+    
+    if total_ms >= settings.slow_request_ms:
+        await db.slow_log.insert_one({"id": str(uuid.uuid4()), "type": "request", **breakdown})
+    
+    return response
+
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -477,6 +1553,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def dedupe_settings():
+    """Keep one document per settings id; concurrent first loads used to insert app_settings twice"""
+    duplicates = await db.settings.aggregate([
+        {"$group": {"_id": "$id", "keep": {"$first": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(None)
+    for duplicate in duplicates:
+        # The first document in natural order is the one get_settings and update_settings have been using
+        result = await db.settings.delete_many({"id": duplicate['_id'], "_id": {"$ne": duplicate['keep']}})
+        logging.warning(f"Removed {result.deleted_count} duplicate settings documents with id {duplicate['_id']}")
+
+@app.on_event("startup")
+async def create_indexes():
+    # Capped collections keep the profiling logs bounded without a cleanup job
+    for name in PROFILE_COLLECTIONS:
+        try:
+            await db.create_collection(name, capped=True, size=PROFILE_LOG_BYTES)
+        except CollectionInvalid:
+            pass
+    await dedupe_settings()
+    for name, indexes in INDEXES.items():
+        try:
+            await db[name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Existing data that violates a unique index must not keep every worker from booting
+            logging.error(f"Could not create indexes on {name}: {str(e)}")
+    command_profiler.loop = asyncio.get_running_loop()
+
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await job_runner.stop()
     client.close()
\ No newline at end of file
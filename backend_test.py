@@ -193,6 +193,57 @@ class RoyalKoltukAPITester:
                 else:
                     print(f"❌ Missing field: {field}")
 
+    def test_bootstrap(self):
+        """Test combined initial data endpoint"""
+        print("\n" + "="*50)
+        print("TESTING BOOTSTRAP")
+        print("="*50)
+        
+        success, data = self.run_test("Get Bootstrap", "GET", "bootstrap", 200, params={"days_before": 7, "days_after": 7})
+        if success:
+            required_fields = ['services', 'appointments', 'appointments_window', 'stats', 'settings']
+            for field in required_fields:
+                if field in data:
+                    print(f"✅ {field} present")
+                else:
+                    print(f"❌ Missing field: {field}")
+            
+            window = data.get('appointments_window', {})
+            outside = [a for a in data.get('appointments', [])
+                       if not window.get('start_date', '') <= a['appointment_date'] <= window.get('end_date', '')]
+            if outside:
+                print(f"❌ {len(outside)} appointments outside window {window}")
+            else:
+                print(f"✅ All appointments within window {window}")
+
+    def test_jobs(self):
+        """Test background job status endpoints"""
+        print("\n" + "="*50)
+        print("TESTING BACKGROUND JOBS")
+        print("="*50)
+        
+        success, data = self.run_test("Get Jobs", "GET", "jobs", 200)
+        if success:
+            for job in data.get('jobs', []):
+                print(f"   {job['name']}: leader={job['leader']}, avg={job['avg_duration_ms']} ms")
+                self.run_test(f"Get {job['name']} Runs", "GET", f"jobs/{job['name']}/runs", 200, params={"limit": 5})
+        
+        self.run_test("Get Non-existent Job Runs", "GET", "jobs/non-existent-job/runs", 404)
+
+    def test_profiling(self):
+        """Test profiling settings and logs endpoints"""
+        print("\n" + "="*50)
+        print("TESTING PROFILING")
+        print("="*50)
+        
+        success, settings = self.run_test("Get Profiling Settings", "GET", "profiling", 200)
+        if success:
+            print(f"   Sample rate: {settings.get('sample_rate')}, slow request: {settings.get('slow_request_ms')} ms")
+        
+        self.run_test("Get Request Profiles", "GET", "profiling/profiles", 200, params={"limit": 5})
+        self.run_test("Get Slow Log", "GET", "profiling/slow", 200, params={"type": "command", "limit": 5})
+        self.run_test("Get Non-existent Profile", "GET", "profiling/profiles/non-existent-id", 404)
+
     def test_settings(self):
         """Test settings management endpoints"""
         print("\n" + "="*50)
@@ -267,6 +318,9 @@ class RoyalKoltukAPITester:
             self.test_appointments()
             self.test_transactions()
             self.test_dashboard_stats()
+            self.test_bootstrap()
+            self.test_jobs()
+            self.test_profiling()
             self.test_settings()
             self.test_customer_history()
             
@@ -20,21 +20,33 @@ function App() {
   const [services, setServices] = useState([]);
   const [appointments, setAppointments] = useState([]);
   const [stats, setStats] = useState(null);
+  const [settings, setSettings] = useState(null);
+  const [appointmentsWindow, setAppointmentsWindow] = useState(null);
   const [selectedAppointment, setSelectedAppointment] = useState(null);
   const [showForm, setShowForm] = useState(false);
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
 
   useEffect(() => {
-    loadServices();
-    loadAppointments();
-    loadStats();
-    initializeDefaultServices();
+    loadBootstrap();
   }, []);
 
-  const initializeDefaultServices = async () => {
+  const loadBootstrap = async () => {
     try {
-      const response = await axios.get(`${API}/services`);
-      if (response.data.length === 0) {
+      const response = await axios.get(`${API}/bootstrap`);
+      setServices(response.data.services);
+      setAppointments(response.data.appointments);
+      setAppointmentsWindow(response.data.appointments_window);
+      setStats(response.data.stats);
+      setSettings(response.data.settings);
+      initializeDefaultServices(response.data.services);
+    } catch (error) {
+      toast.error("Veriler yüklenemedi");
+    }
+  };
+
+  const initializeDefaultServices = async (existingServices) => {
+    try {
+      if (existingServices.length === 0) {
         const defaultServices = [
           { name: "Tek Adet Koltuk Takımı Yıkama", price: 450 },
           { name: "Koltuk Takımı Yıkama", price: 650 },
@@ -63,7 +75,23 @@ function App() {
     }
   };
 
+  // Only the bootstrap caps upcoming appointments; reloads always fetch every future appointment
   const loadAppointments = async () => {
+    try {
+      const params = appointmentsWindow ? { start_date: appointmentsWindow.start_date } : {};
+      const response = await axios.get(`${API}/appointments`, { params });
+      setAppointments(response.data);
+      if (appointmentsWindow?.end_date) {
+        setAppointmentsWindow({ start_date: appointmentsWindow.start_date, end_date: null });
+      }
+    } catch (error) {
+      toast.error("Randevular yüklenemedi");
+    }
+  };
+
+  // The bootstrap only loads a window around today; past appointments and searches need all of them
+  const loadFullHistory = async () => {
+    setAppointmentsWindow(null);
     try {
       const response = await axios.get(`${API}/appointments`);
       setAppointments(response.data);
@@ -202,12 +230,15 @@ function App() {
               loadAppointments();
               loadStats();
             }}
+            onLoadHistory={appointmentsWindow ? loadFullHistory : null}
+            onLoadFuture={appointmentsWindow?.end_date ? loadAppointments : null}
           />
         )}
         
         {currentView === "dashboard" && showForm && (
           <AppointmentForm
             services={services}
+            settings={settings}
             appointment={selectedAppointment}
             onSave={handleAppointmentSaved}
             onCancel={() => {
@@ -243,7 +274,10 @@ function App() {
         )}
         
         {currentView === "settings" && (
-          <Settings />
+          <Settings
+            initialSettings={settings}
+            onSaved={setSettings}
+          />
         )}
       </main>
     </div>
@@ -16,7 +16,7 @@ import { Popover, PopoverContent, PopoverTrigger } from "@/components/ui/popover
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
-const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
+const AppointmentForm = ({ services, settings: initialSettings, appointment, onSave, onCancel }) => {
   const [formData, setFormData] = useState({
     customer_name: "",
     phone: "",
@@ -24,14 +24,18 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
     service_id: "",
     appointment_date: new Date(),
     appointment_time: "",
+    crew: "auto",
     notes: ""
   });
-  const [settings, setSettings] = useState(null);
+  const [settings, setSettings] = useState(initialSettings);
   const [timeSlots, setTimeSlots] = useState([]);
+  const [availableCrews, setAvailableCrews] = useState({});
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
-    loadSettings();
+    if (!initialSettings) {
+      loadSettings();
+    }
     if (appointment) {
       setFormData({
         customer_name: appointment.customer_name,
@@ -40,6 +44,7 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
         service_id: appointment.service_id,
         appointment_date: new Date(appointment.appointment_date),
         appointment_time: appointment.appointment_time,
+        crew: String(appointment.crew || 1),
         notes: appointment.notes || ""
       });
     }
@@ -51,6 +56,12 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
     }
   }, [settings]);
 
+  useEffect(() => {
+    if (settings && formData.appointment_date) {
+      loadAvailability();
+    }
+  }, [settings, formData.appointment_date, formData.service_id]);
+
   const loadSettings = async () => {
     try {
       const response = await axios.get(`${API}/settings`);
@@ -60,6 +71,38 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
     }
   };
 
+  const loadAvailability = async () => {
+    try {
+      const params = { date: format(formData.appointment_date, "yyyy-MM-dd") };
+      if (formData.service_id) params.service_id = formData.service_id;
+      if (appointment) params.exclude_id = appointment.id;
+
+      const response = await axios.get(`${API}/availability`, { params });
+      const crewsByTime = {};
+      response.data.slots.forEach((slot) => {
+        crewsByTime[slot.time] = slot.available_crews;
+      });
+      setAvailableCrews(crewsByTime);
+    } catch (error) {
+      console.error("Müsaitlik bilgisi yüklenemedi:", error);
+    }
+  };
+
+  // Only a crew the user picked is sent; an unchanged crew on edit lets the server keep or reassign it
+  const selectedCrew = () => {
+    const originalCrew = appointment ? String(appointment.crew || 1) : "auto";
+    if (formData.crew === "auto" || formData.crew === originalCrew) return null;
+    return parseInt(formData.crew);
+  };
+
+  const isSlotFull = (time) => {
+    const crews = availableCrews[time];
+    if (!crews) return false;
+    const crew = selectedCrew();
+    if (crew !== null) return !crews.includes(crew);
+    return crews.length === 0;
+  };
+
   const generateTimeSlots = () => {
     if (!settings) return;
 
@@ -107,7 +150,8 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
     try {
       const payload = {
         ...formData,
-        appointment_date: format(formData.appointment_date, "yyyy-MM-dd")
+        appointment_date: format(formData.appointment_date, "yyyy-MM-dd"),
+        crew: selectedCrew()
       };
 
       if (appointment) {
@@ -239,10 +283,11 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
                 </SelectTrigger>
                 <SelectContent>
                   {timeSlots.map((time) => (
-                    <SelectItem key={time} value={time}>
+                    <SelectItem key={time} value={time} disabled={isSlotFull(time)}>
                       <div className="flex items-center gap-2">
                         <Clock className="w-4 h-4" />
                         {time}
+                        {isSlotFull(time) && <span className="text-xs text-gray-400">(Dolu)</span>}
                       </div>
                     </SelectItem>
                   ))}
@@ -251,6 +296,28 @@ const AppointmentForm = ({ services, appointment, onSave, onCancel }) => {
             </div>
           </div>
 
+          {settings && settings.crew_count > 1 && (
+            <div className="space-y-2">
+              <Label htmlFor="crew">Ekip</Label>
+              <Select
+                value={formData.crew}
+                onValueChange={(value) => setFormData({ ...formData, crew: value })}
+              >
+                <SelectTrigger data-testid="crew-select">
+                  <SelectValue placeholder="Ekip seçin" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="auto">Otomatik</SelectItem>
+                  {Array.from({ length: settings.crew_count }, (_, i) => String(i + 1)).map((crew) => (
+                    <SelectItem key={crew} value={crew}>
+                      Ekip {crew}
+                    </SelectItem>
+                  ))}
+                </SelectContent>
+              </Select>
+            </div>
+          )}
+
           <div className="space-y-2">
             <Label htmlFor="notes">Notlar</Label>
             <Textarea
@@ -29,7 +29,7 @@ import {
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
-const Dashboard = ({ appointments, stats, onEditAppointment, onNewAppointment, onRefresh }) => {
+const Dashboard = ({ appointments, stats, onEditAppointment, onNewAppointment, onRefresh, onLoadHistory, onLoadFuture }) => {
   const [view, setView] = useState("today"); // today, past, future
   const [filteredAppointments, setFilteredAppointments] = useState([]);
   const [deleteDialog, setDeleteDialog] = useState(null);
@@ -42,6 +42,15 @@ const Dashboard = ({ appointments, stats, onEditAppointment, onNewAppointment, o
     filterAppointments();
   }, [appointments, view, searchTerm]);
 
+  // Past, far-future and searched appointments can lie outside the window loaded on start
+  useEffect(() => {
+    if (onLoadHistory && (view === "past" || searchTerm)) {
+      onLoadHistory();
+    } else if (onLoadFuture && view === "future") {
+      onLoadFuture();
+    }
+  }, [view, searchTerm, onLoadHistory, onLoadFuture]);
+
   const filterAppointments = () => {
     let filtered = [...appointments];
 
@@ -32,18 +32,18 @@ const ServiceManagement = ({ services, onRefresh }) => {
   const [showDialog, setShowDialog] = useState(false);
   const [deleteDialog, setDeleteDialog] = useState(null);
   const [editingService, setEditingService] = useState(null);
-  const [formData, setFormData] = useState({ name: "", price: "" });
+  const [formData, setFormData] = useState({ name: "", price: "", duration: "60" });
   const [loading, setLoading] = useState(false);
 
   const handleEdit = (service) => {
     setEditingService(service);
-    setFormData({ name: service.name, price: service.price.toString() });
+    setFormData({ name: service.name, price: service.price.toString(), duration: String(service.duration || 60) });
     setShowDialog(true);
   };
 
   const handleNew = () => {
     setEditingService(null);
-    setFormData({ name: "", price: "" });
+    setFormData({ name: "", price: "", duration: "60" });
     setShowDialog(true);
   };
 
@@ -61,9 +61,15 @@ const ServiceManagement = ({ services, onRefresh }) => {
       return;
     }
 
+    const duration = parseInt(formData.duration);
+    if (isNaN(duration) || duration <= 0) {
+      toast.error("Geçerli bir süre girin");
+      return;
+    }
+
     setLoading(true);
     try {
-      const payload = { name: formData.name, price };
+      const payload = { name: formData.name, price, duration };
       
       if (editingService) {
         await axios.put(`${API}/services/${editingService.id}`, payload);
@@ -74,7 +80,7 @@ const ServiceManagement = ({ services, onRefresh }) => {
       }
       
       setShowDialog(false);
-      setFormData({ name: "", price: "" });
+      setFormData({ name: "", price: "", duration: "60" });
       onRefresh();
     } catch (error) {
       toast.error("İşlem başarısız");
@@ -128,6 +134,7 @@ const ServiceManagement = ({ services, onRefresh }) => {
                 <div>
                   <h3 className="font-semibold text-gray-900">{service.name}</h3>
                   <p className="text-lg font-bold text-blue-600">{Math.round(service.price)}₺</p>
+                  <p className="text-xs text-gray-500">{service.duration || 60} dakika</p>
                 </div>
               </div>
             </div>
@@ -190,6 +197,20 @@ const ServiceManagement = ({ services, onRefresh }) => {
                 required
               />
             </div>
+            <div className="space-y-2">
+              <Label htmlFor="service-duration">Süre (Dakika)</Label>
+              <Input
+                id="service-duration"
+                data-testid="service-duration-input"
+                type="number"
+                min="15"
+                step="15"
+                value={formData.duration}
+                onChange={(e) => setFormData({ ...formData, duration: e.target.value })}
+                placeholder="60"
+                required
+              />
+            </div>
             <DialogFooter>
               <Button type="button" variant="outline" onClick={() => setShowDialog(false)}>
                 İptal
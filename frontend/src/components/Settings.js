@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { Settings as SettingsIcon, Clock, Save } from "lucide-react";
+import { Settings as SettingsIcon, Clock, Save, Users } from "lucide-react";
 import { toast } from "sonner";
 import axios from "axios";
 import { Button } from "@/components/ui/button";
@@ -10,16 +10,19 @@ import { Card } from "@/components/ui/card";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
-const Settings = () => {
-  const [settings, setSettings] = useState({
+const Settings = ({ initialSettings, onSaved }) => {
+  const [settings, setSettings] = useState(initialSettings || {
     work_start_hour: 7,
     work_end_hour: 3,
-    appointment_interval: 30
+    appointment_interval: 30,
+    crew_count: 1
   });
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
-    loadSettings();
+    if (!initialSettings) {
+      loadSettings();
+    }
   }, []);
 
   const loadSettings = async () => {
@@ -49,6 +52,11 @@ const Settings = () => {
       return;
     }
 
+    if (settings.crew_count < 1 || settings.crew_count > 20) {
+      toast.error("Ekip sayısı 1-20 arası olmalı");
+      return;
+    }
+
     setLoading(true);
     try {
       await axios.put(`${API}/settings`, {
@@ -56,6 +64,7 @@ const Settings = () => {
         id: "app_settings"
       });
       toast.success("Ayarlar kaydedildi");
+      if (onSaved) onSaved(settings);
     } catch (error) {
       toast.error("Ayarlar kaydedilemedi");
     } finally {
@@ -141,6 +150,24 @@ const Settings = () => {
             <p className="text-xs text-gray-500">Randevular arası süre (15-120 dakika)</p>
           </div>
 
+          <div className="space-y-2">
+            <Label htmlFor="crew-count">
+              <Users className="w-4 h-4 inline mr-2" />
+              Ekip Sayısı
+            </Label>
+            <Input
+              id="crew-count"
+              data-testid="crew-count-input"
+              type="number"
+              min="1"
+              max="20"
+              value={settings.crew_count}
+              onChange={(e) => setSettings({ ...settings, crew_count: parseInt(e.target.value) })}
+              required
+            />
+            <p className="text-xs text-gray-500">Aynı saatte yapılabilecek iş sayısı</p>
+          </div>
+
           <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
             <p className="text-sm text-blue-900">
               <strong>Örnek:</strong> Başlangıç saati <strong>{settings.work_start_hour}:00</strong>, 
@@ -0,0 +1,56 @@
+import os
+import sys
+import uuid
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# server.py reads its configuration at import time
+os.environ.setdefault('MONGO_URL', os.environ.get('MONGO_TEST_URL', 'mongodb://localhost:27017'))
+os.environ.setdefault('DB_NAME', 'randevu_test')
+os.environ.setdefault('TWILIO_ACCOUNT_SID', 'ACtest')
+os.environ.setdefault('TWILIO_AUTH_TOKEN', 'test')
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+
+@pytest.fixture
+def run_with_db(monkeypatch):
+    """Run `test(db)` on a fresh, indexed test database that server.db points to"""
+    pymongo = pytest.importorskip("pymongo")
+    motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+    server = pytest.importorskip("server", reason="backend dependencies are not installed")
+
+    ping_client = pymongo.MongoClient(os.environ['MONGO_URL'], serverSelectionTimeoutMS=2000)
+    try:
+        ping_client.admin.command("ping")
+    except pymongo.errors.ServerSelectionTimeoutError:
+        pytest.skip("no local mongod to run against")
+    finally:
+        ping_client.close()
+
+    sent_sms = []
+    monkeypatch.setattr(server, 'send_sms', lambda phone, message: sent_sms.append((phone, message)) or True)
+    monkeypatch.setattr(server, 'REMINDER_SMS_PER_SECOND', 1000)
+
+    def run(test):
+        async def main():
+            # Same listener as the app's client, so request profiles see the test's commands
+            client = motor_asyncio.AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[server.command_profiler])
+            db = client[f"{os.environ['DB_NAME']}_{uuid.uuid4().hex[:8]}"]
+            monkeypatch.setattr(server, 'db', db)
+            server.availability.clear()
+            for name, indexes in server.INDEXES.items():
+                await db[name].create_indexes(indexes)
+            try:
+                return await test(db)
+            finally:
+                server.availability.clear()
+                await client.drop_database(db.name)
+                client.close()
+
+        return asyncio.run(main())
+
+    run.sent_sms = sent_sms
+    return run
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+pydantic = pytest.importorskip("pydantic")
+
+
+def future_date(days: int) -> str:
+    return (datetime.now(server.TURKEY_TZ).date() + timedelta(days=days)).isoformat()
+
+
+async def setup(db, crew_count: int = 1):
+    await db.services.insert_one({"id": "two-hours", "name": "Koltuk Takımı Yıkama", "price": 650, "duration": 120,
+                                  "created_at": datetime.now(timezone.utc).isoformat()})
+    await server.update_settings(server.Settings(crew_count=crew_count))
+
+
+def booking(time: str, **fields) -> "server.AppointmentCreate":
+    return server.AppointmentCreate(
+        customer_name="Ali Yılmaz", phone="05551234567", address="Adres",
+        service_id="two-hours", appointment_date=future_date(3), appointment_time=time, **fields
+    )
+
+
+def test_conflict_sees_bookings_hidden_behind_shorter_ones():
+    schedule = server.CrewSchedule()
+    schedule.add(600, 900, "a")
+    schedule.add(650, 660, "b")
+    assert schedule.conflict(700, 710) == "a"
+    assert schedule.conflict(700, 710, exclude_id="a") is None
+    assert schedule.conflict(900, 960) is None
+
+    schedule.remove("a")
+    assert schedule.conflict(700, 710) is None
+    assert schedule.conflict(655, 700) == "b"
+
+
+def test_slot_minutes_rejects_malformed_times():
+    settings = server.Settings()
+    assert server.slot_minutes("14:30", settings) == 14 * 60 + 30
+    assert server.slot_minutes("01:00", settings) == 25 * 60
+    for time in ("10:00:00", "25:00", "10:75", "", "abc"):
+        with pytest.raises(ValueError):
+            server.slot_minutes(time, settings)
+
+
+@pytest.mark.parametrize("model, fields", [
+    ("ServiceCreate", {"name": "Koltuk", "price": 650, "duration": 0}),
+    ("ServiceUpdate", {"duration": -30}),
+    ("Settings", {"crew_count": 0}),
+    ("Settings", {"appointment_interval": 0}),
+])
+def test_durations_and_crew_counts_must_be_positive(model, fields):
+    with pytest.raises(pydantic.ValidationError):
+        getattr(server, model)(**fields)
+
+
+def test_expired_days_are_evicted():
+    index = server.AvailabilityIndex()
+    index.days["2026-01-01"] = {}
+    index.loaded_at["2026-01-01"] = server.time.monotonic() - server.AVAILABILITY_CACHE_SECONDS - 1
+    index.evict_expired()
+    assert index.days == {} and index.loaded_at == {}
+
+
+def test_two_hour_job_blocks_the_slots_it_covers(run_with_db):
+    async def test(db):
+        await setup(db)
+        await server.create_appointment(booking("14:00"))
+
+        with pytest.raises(server.HTTPException) as error:
+            await server.create_appointment(booking("14:30"))
+        assert error.value.status_code == 400
+        # The job ends at 16:00, so the next one may start then
+        await server.create_appointment(booking("16:00"))
+
+        availability = await server.get_availability(future_date(3), service_id="two-hours")
+        crews = {slot['time']: slot['available_crews'] for slot in availability['slots']}
+        assert crews["13:00"] == [] and crews["15:30"] == [] and crews["12:00"] == [1]
+
+    run_with_db(test)
+
+
+def test_jobs_are_spread_over_crews(run_with_db):
+    async def test(db):
+        await setup(db, crew_count=2)
+        first = await server.create_appointment(booking("14:00"))
+        second = await server.create_appointment(booking("14:30"))
+        assert (first.crew, second.crew) == (1, 2)
+
+        with pytest.raises(server.HTTPException) as error:
+            await server.create_appointment(booking("15:00"))
+        assert error.value.status_code == 400
+
+        with pytest.raises(server.HTTPException) as error:
+            await server.create_appointment(booking("18:00", crew=3))
+        assert error.value.status_code == 400
+
+        # Editing without picking a crew still works after crew_count drops below the job's crew
+        await server.update_settings(server.Settings(crew_count=1))
+        updated = await server.update_appointment(second.id, server.AppointmentUpdate(appointment_time="10:00"))
+        assert (updated['appointment_time'], updated['crew']) == ("10:00", 1)
+
+    run_with_db(test)
+
+
+def test_concurrent_bookings_cannot_take_the_same_crew(run_with_db):
+    async def test(db):
+        await setup(db)
+        results = await asyncio.gather(
+            server.create_appointment(booking("14:00")),
+            server.create_appointment(booking("14:30")),
+            return_exceptions=True
+        )
+        assert sum(isinstance(result, server.HTTPException) for result in results) == 1
+        assert await db.appointments.count_documents({}) == 1
+        assert await db.booking_locks.count_documents({}) == 0
+
+    run_with_db(test)
+
+
+def test_malformed_time_is_a_bad_request(run_with_db):
+    async def test(db):
+        await setup(db)
+        with pytest.raises(server.HTTPException) as error:
+            await server.create_appointment(booking("10:00:00"))
+        assert error.value.status_code == 400
+
+    run_with_db(test)
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+
+
+def slow_runner() -> "server.JobRunner":
+    runner = server.JobRunner()
+
+    @runner.periodic("slow", 60)
+    async def slow():
+        await asyncio.sleep(10)
+
+    return runner
+
+
+def test_job_is_cancelled_when_its_lease_is_lost(run_with_db, monkeypatch):
+    monkeypatch.setattr(server, 'JOB_HEARTBEAT_SECONDS', 0.01)
+    runner = slow_runner()
+
+    async def lose_lease(name):
+        return False
+    monkeypatch.setattr(runner, 'acquire_lease', lose_lease)
+
+    async def test(db):
+        await asyncio.wait_for(runner.run_once(runner.jobs["slow"]), timeout=5)
+        run = await db.job_runs.find_one({"job": "slow"})
+        assert (run['status'], run['error']) == ("cancelled", "lease lost")
+
+    run_with_db(test)
+
+
+def test_stop_waits_for_running_jobs_and_records_them(run_with_db):
+    runner = slow_runner()
+
+    async def test(db):
+        runner.start()
+        while not await db.job_runs.find_one({"job": "slow"}):
+            await asyncio.sleep(0.01)
+
+        await runner.stop()
+        run = await db.job_runs.find_one({"job": "slow"})
+        assert (run['status'], run['error']) == ("cancelled", "worker shutting down")
+        assert await db.job_leases.count_documents({}) == 0
+
+    run_with_db(test)
@@ -0,0 +1,60 @@
+import pytest
+
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+httpx = pytest.importorskip("httpx")
+
+
+@pytest.fixture
+def profiling(run_with_db, monkeypatch):
+    monkeypatch.setattr(server, 'PROFILE_HEADER_TOKEN', "secret")
+    monkeypatch.setitem(server.profiling_cache, 'settings', server.ProfilingSettings(sample_rate=0))
+    monkeypatch.setitem(server.profiling_cache, 'loaded_at', None)
+    return run_with_db
+
+
+def api_client() -> "httpx.AsyncClient":
+    # Runs the app on the test's event loop, which the test database client is bound to
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+
+
+def test_profile_header_stores_a_request_profile(profiling):
+    async def test(db):
+        async with api_client() as client:
+            response = await client.get("/api/services", headers={"X-Profile": "secret"})
+        assert response.status_code == 200
+        assert "total;dur=" in response.headers["Server-Timing"]
+
+        profile = await db.request_profiles.find_one({"id": response.headers["X-Profile-Id"]})
+        assert profile['path'] == "/api/services"
+        assert [command['collection'] for command in profile['mongo_commands']] == ["services"]
+        assert profile['endpoint_ms'] is not None
+        assert profile['validation_serialization_ms'] is not None
+
+    profiling(test)
+
+
+def test_slow_requests_are_logged(profiling):
+    async def test(db):
+        await server.update_profiling(server.ProfilingSettings(sample_rate=0, slow_request_ms=0))
+        async with api_client() as client:
+            response = await client.get("/api/services")
+        assert response.status_code == 200
+
+        entry = await db.slow_log.find_one({"type": "request"})
+        assert entry['path'] == "/api/services"
+        assert await db.request_profiles.count_documents({}) == 0
+
+    profiling(test)
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "1"}, {"X-Profile": "wrong"}])
+def test_requests_without_the_token_store_nothing(profiling, headers):
+    async def test(db):
+        async with api_client() as client:
+            response = await client.get("/api/services", headers=headers)
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+        assert await db.request_profiles.count_documents({}) == 0
+        assert await db.slow_log.count_documents({}) == 0
+
+    profiling(test)
@@ -0,0 +1,361 @@
+"""Query-plan regression tests.
+
+Calls every API route and background job against a seeded local mongod (MONGO_TEST_URL,
+default mongodb://localhost:27017) with the indexes from server.INDEXES, captures the
+Mongo commands they actually send, and checks the explain output of each: no COLLSCAN,
+no in-memory SORT, and a bounded ratio of examined keys/documents to returned documents.
+"""
+import os
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+
+MAX_EXAMINED_RATIO = float(os.environ.get('QUERY_PLAN_MAX_RATIO', '2'))
+
+TODAY = date.today()
+NOW = datetime.now(timezone.utc)
+
+
+def day(offset: int) -> str:
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+
+def seed(db) -> dict:
+    """Fill the test database with a few months of realistic data and return values to query by"""
+    rng = random.Random(42)
+    services = [
+        {"id": f"service-{i}", "name": f"Hizmet {i}", "price": 400 + i * 50, "duration": 60 + i * 15,
+         "created_at": NOW.isoformat()}
+        for i in range(6)
+    ]
+    db.services.insert_many(services)
+
+    names = ["Ali Yılmaz", "Ayşe Demir", "Mehmet Kaya", "Fatma Çelik", "İsmail Şahin", "Zeynep Aydın"]
+    phones = [f"0555{rng.randint(1000000, 9999999)}" for _ in range(400)]
+    appointments, transactions, reminders = [], [], []
+    for offset in range(-150, 61):
+        for slot in range(15):
+            service = rng.choice(services)
+            phone = rng.choice(phones)
+            customer_name = f"{rng.choice(names)} {rng.randint(1, 500)}"
+            if offset < 0:
+                status = rng.choices(["Tamamlandı", "İptal", "Bekliyor"], [8, 1, 1])[0]
+            elif offset == 0:
+                status = rng.choice(["Tamamlandı", "Bekliyor", "İptal"])
+            else:
+                status = rng.choices(["Bekliyor", "İptal"], [9, 1])[0]
+            appointment = {
+                "id": f"appointment-{offset}-{slot}",
+                "customer_name": customer_name,
+                "phone": phone,
+                "address": "Adres",
+                "service_id": service['id'],
+                "service_name": service['name'],
+                "service_price": service['price'],
+                "appointment_date": day(offset),
+                "appointment_time": f"{7 + slot:02d}:00",
+                "duration": service['duration'],
+                "crew": rng.randint(1, 3),
+                "notes": "",
+                "status": status,
+                "created_at": NOW.isoformat(),
+                "search_terms": server.search_terms(customer_name, phone)
+            }
+            appointments.append(appointment)
+
+            if status == "Tamamlandı":
+                transactions.append({
+                    "id": f"transaction-{appointment['id']}",
+                    "appointment_id": appointment['id'],
+                    "customer_name": customer_name,
+                    "service_name": service['name'],
+                    "amount": service['price'],
+                    "date": appointment['appointment_date'],
+                    "created_at": NOW.isoformat()
+                })
+
+            if status == "Bekliyor" or offset < 0:
+                for offset_minutes in (1440, 120):
+                    remind_at = (
+                        datetime.combine(TODAY + timedelta(days=offset), datetime.min.time(), timezone.utc)
+                        + timedelta(hours=7 + slot, minutes=-offset_minutes)
+                    )
+                    reminders.append({
+                        "id": f"reminder-{appointment['id']}-{offset_minutes}",
+                        "appointment_id": appointment['id'],
+                        "offset_minutes": offset_minutes,
+                        "appointment_date": appointment['appointment_date'],
+                        "appointment_time": appointment['appointment_time'],
+                        "remind_at": remind_at,
+                        # The last two days stay pending so some reminders are always due
+                        "status": "pending" if remind_at > NOW - timedelta(days=2) else "sent",
+                        "created_at": NOW.isoformat()
+                    })
+
+    db.appointments.insert_many(appointments)
+    db.transactions.insert_many(transactions)
+    db.reminders.insert_many(reminders)
+    db.settings.insert_many([server.Settings().model_dump(), server.ProfilingSettings().model_dump()])
+
+    jobs = list(server.job_runner.jobs)
+    db.job_leases.insert_many([
+        {"job": job, "owner": "worker-1", "expires_at": NOW + timedelta(seconds=30)} for job in jobs
+    ])
+    db.job_runs.insert_many([
+        server.JobRun(
+            job=jobs[i % len(jobs)],
+            worker="worker-1",
+            status="success",
+            started_at=NOW - timedelta(minutes=i),
+            duration_ms=rng.uniform(1, 500)
+        ).model_dump()
+        for i in range(600)
+    ])
+    db.slow_log.insert_many([
+        {"id": f"slow-{i}", "type": "request" if i % 3 else "command", "duration_ms": 1500,
+         "created_at": NOW - timedelta(seconds=i)}
+        for i in range(300)
+    ])
+    db.request_profiles.insert_many([
+        {"id": f"profile-{i}", "path": "/api/appointments", "total_ms": 100, "created_at": NOW - timedelta(seconds=i)}
+        for i in range(100)
+    ])
+
+    return {
+        "appointment_id": appointments[len(appointments) // 2]['id'],
+        "future_appointment_id": next(
+            a['id'] for a in appointments if a['appointment_date'] == day(10) and a['status'] == "Bekliyor"
+        ),
+        "deleted_appointment_id": next(
+            a['id'] for a in appointments if a['appointment_date'] == day(20) and a['status'] == "Bekliyor"
+        ),
+        "phone": appointments[0]['phone'],
+        "transaction_id": transactions[0]['id'],
+        "reminder_appointment_id": next(r['appointment_id'] for r in reminders if r['status'] == "pending"),
+        "reminder_id": next(r['id'] for r in reminders if r['status'] == "pending"),
+        "job": jobs[0],
+    }
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client = pymongo.MongoClient(os.environ['MONGO_URL'], serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.ServerSelectionTimeoutError:
+        pytest.skip("no local mongod to run query plans against")
+
+    test_db = client[f"{os.environ['DB_NAME']}_query_plans"]
+    client.drop_database(test_db.name)
+    for name in server.PROFILE_COLLECTIONS:
+        test_db.create_collection(name, capped=True, size=server.PROFILE_LOG_BYTES)
+    for name, indexes in server.INDEXES.items():
+        test_db[name].create_indexes(indexes)
+    values = seed(test_db)
+
+    yield test_db, values
+
+    client.drop_database(test_db.name)
+    client.close()
+
+
+# Route and job calls, keyed by name; each gets the seeded values
+CASES = {
+    "get_appointments": lambda v: server.get_appointments(),
+    "get_appointments date": lambda v: server.get_appointments(date=day(0)),
+    "get_appointments status": lambda v: server.get_appointments(status="Bekliyor"),
+    "get_appointments date and status": lambda v: server.get_appointments(date=day(-3), status="Tamamlandı"),
+    "get_appointments window": lambda v: server.get_appointments(start_date=day(-7), end_date=day(7)),
+    "get_appointments search name": lambda v: server.get_appointments(search="Zeynep"),
+    "get_appointments search part of name": lambda v: server.get_appointments(search="eyne"),
+    "get_appointments search phone": lambda v: server.get_appointments(search=v['phone'][-7:]),
+    "get_appointments search formatted phone": lambda v: server.get_appointments(
+        search=f"+90 {v['phone'][1:4]} {v['phone'][4:7]} {v['phone'][7:]}"
+    ),
+    "get_appointment": lambda v: server.get_appointment(v['appointment_id']),
+    "create_appointment": lambda v: server.create_appointment(server.AppointmentCreate(
+        customer_name="Yeni Müşteri", phone="05559876543", address="Adres",
+        service_id="service-2", appointment_date=day(30), appointment_time="01:00"
+    )),
+    "update_appointment notes": lambda v: server.update_appointment(
+        v['appointment_id'], server.AppointmentUpdate(notes="Not")
+    ),
+    "update_appointment reschedule": lambda v: server.update_appointment(
+        v['future_appointment_id'], server.AppointmentUpdate(appointment_time="01:00")
+    ),
+    "delete_appointment": lambda v: server.delete_appointment(v['deleted_appointment_id']),
+    "get_customer_history": lambda v: server.get_customer_history(v['phone']),
+    "get_dashboard_stats": lambda v: server.get_dashboard_stats(),
+    "get_transactions": lambda v: server.get_transactions(),
+    "get_transactions range": lambda v: server.get_transactions(start_date=day(-30), end_date=day(0)),
+    "get_transactions start": lambda v: server.get_transactions(start_date=day(-7)),
+    "update_transaction": lambda v: server.update_transaction(v['transaction_id'], server.TransactionUpdate(amount=500)),
+    "get_service": lambda v: server.get_service("service-3"),
+    "get_settings": lambda v: server.get_settings(),
+    "get_bootstrap": lambda v: server.get_bootstrap(),
+    "get_availability": lambda v: server.get_availability(day(1), service_id="service-1"),
+    "dispatch_due_reminders": lambda v: server.dispatch_due_reminders(),
+    "cancel_reminders": lambda v: server.cancel_reminders(v['reminder_appointment_id']),
+    "sync_reminders": lambda v: server.sync_reminders(),
+    "expire_stuck_reminders": lambda v: server.expire_stuck_reminders(),
+    "backfill_search_terms": lambda v: server.backfill_search_terms(),
+    "acquire_lease": lambda v: server.job_runner.acquire_lease(v['job']),
+    "is_due": lambda v: server.job_runner.is_due(server.job_runner.jobs[v['job']]),
+    "job_runner stop": lambda v: server.job_runner.stop(),
+    "get_jobs": lambda v: server.get_jobs(),
+    "get_job_runs": lambda v: server.get_job_runs(v['job']),
+    "get_profiling": lambda v: server.get_profiling(),
+    "get_request_profiles": lambda v: server.get_request_profiles(),
+    "get_request_profile": lambda v: server.get_request_profile("profile-5"),
+    "get_slow_log": lambda v: server.get_slow_log(),
+    "get_slow_log type": lambda v: server.get_slow_log(type="command"),
+}
+
+# Search terms are index ranges that cannot return documents in date order; only the matches are sorted
+ALLOW_SORT = {
+    "get_appointments search name",
+    "get_appointments search part of name",
+    "get_appointments search phone",
+    "get_appointments search formatted phone",
+}
+
+QUERY_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+# Session and transport fields the driver adds, which explain does not accept
+DRIVER_FIELDS = {'lsid', 'txnNumber', 'readConcern', 'writeConcern', 'startTransaction', 'autocommit'}
+
+
+class CommandCapture(pymongo.monitoring.CommandListener):
+    """Records the query commands a route sends"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in QUERY_COMMANDS:
+            self.commands.append({
+                key: value for key, value in event.command.items()
+                if key not in DRIVER_FIELDS and not key.startswith('$')
+            })
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def command_filter(command: dict) -> dict:
+    if 'pipeline' in command:
+        return command['pipeline'][0].get('$match', {}) if command['pipeline'] else {}
+    if 'updates' in command:
+        return command['updates'][0]['q']
+    if 'deletes' in command:
+        return command['deletes'][0]['q']
+    return command.get('filter', command.get('query', {}))
+
+
+def explainable(command: dict) -> dict:
+    """Aggregations only come from count_documents; explain their $match as a find so nReturned counts the matches"""
+    if 'pipeline' in command:
+        return {"find": command['aggregate'], "filter": command_filter(command)}
+    return command
+
+
+def command_shape(value):
+    """The structure of a command with its values blanked out, so repeated calls are explained once"""
+    if isinstance(value, dict):
+        return tuple((key, command_shape(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(command_shape(item) for item in value)
+    return type(value).__name__
+
+
+def winning_plan_and_stats(explain: dict) -> tuple:
+    """Find the query planner output in find, write and aggregate explains"""
+    nodes = [explain]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, dict):
+            if 'queryPlanner' in node and 'executionStats' in node:
+                return node['queryPlanner']['winningPlan'], node['executionStats']
+            nodes.extend(node.values())
+        elif isinstance(node, list):
+            nodes.extend(node)
+    raise AssertionError(f"no query plan in explain output: {explain}")
+
+
+def plan_stages(plan: dict) -> list:
+    """Stage names of a winning plan, for both the classic and the slot-based engine"""
+    stages, nodes = [], [plan]
+    while nodes:
+        node = nodes.pop()
+        if 'stage' in node:
+            stages.append(node['stage'])
+        for key in ('inputStage', 'queryPlan', 'outerStage', 'innerStage'):
+            if key in node:
+                nodes.append(node[key])
+        nodes.extend(node.get('inputStages', []))
+    return stages
+
+
+@pytest.fixture
+def run_route(seeded, monkeypatch):
+    """Call a case's route against the seeded database and return the commands it sent"""
+    db, values = seeded
+    monkeypatch.setattr(server, 'send_sms', lambda phone, message: True)
+    monkeypatch.setattr(server, 'REMINDER_SMS_PER_SECOND', 1000)
+    monkeypatch.setitem(server.profiling_cache, 'loaded_at', None)
+
+    def run(route: str) -> list:
+        capture = CommandCapture()
+
+        async def main():
+            client = motor_asyncio.AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[capture])
+            monkeypatch.setattr(server, 'db', client[db.name])
+            server.availability.clear()
+            try:
+                await CASES[route](values)
+            finally:
+                client.close()
+
+        asyncio.run(main())
+        return capture.commands
+
+    return run
+
+
+@pytest.mark.parametrize("route", CASES)
+def test_route_queries_use_indexes(seeded, run_route, route):
+    db, _ = seeded
+    commands = run_route(route)
+    assert commands, f"{route} sent no queries, the case does not exercise it"
+
+    explained = set()
+    for command in commands:
+        collection = command[next(iter(command))]
+        shape = command_shape(command)
+        if shape in explained:
+            continue
+        explained.add(shape)
+        if not command_filter(command) and not command.get('sort'):
+            continue  # full reads of small collections, e.g. get_services
+
+        explain = db.command({"explain": explainable(command), "verbosity": "executionStats"})
+        plan, stats = winning_plan_and_stats(explain)
+        stages = plan_stages(plan)
+        assert "COLLSCAN" not in stages, f"{route} scans {collection}: {command}"
+        if route not in ALLOW_SORT:
+            assert "SORT" not in stages, f"{route} sorts {collection} in memory: {command}"
+
+        execution = stats.get('executionStages', {})
+        returned = max(stats['nReturned'], execution.get('nMatched', 0), execution.get('nWouldDelete', 0), 1)
+        examined = max(stats['totalKeysExamined'], stats['totalDocsExamined'])
+        assert examined <= returned * MAX_EXAMINED_RATIO, (
+            f"{route} examined {examined} keys/documents of {collection} for {returned} results: {command}"
+        )
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+
+
+def future_date(days: int) -> str:
+    return (datetime.now(server.TURKEY_TZ).date() + timedelta(days=days)).isoformat()
+
+
+async def insert_appointment(db, **fields) -> dict:
+    appointment = {
+        "id": fields.pop('id'),
+        "customer_name": "Ali Yılmaz",
+        "phone": "05551234567",
+        "address": "Adres",
+        "service_id": "service-1",
+        "service_name": "Koltuk Takımı Yıkama",
+        "service_price": 650,
+        "appointment_date": future_date(3),
+        "appointment_time": "10:00",
+        "status": "Bekliyor",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **fields
+    }
+    await db.appointments.insert_one(dict(appointment))
+    return appointment
+
+
+async def insert_due_reminder(db, appointment: dict, offset_minutes: int = 120, minutes_late: int = 1):
+    reminder = server.Reminder(
+        appointment_id=appointment['id'],
+        offset_minutes=offset_minutes,
+        appointment_date=appointment['appointment_date'],
+        appointment_time=appointment['appointment_time'],
+        remind_at=datetime.now(timezone.utc) - timedelta(minutes=minutes_late)
+    )
+    await db.reminders.insert_one(reminder.model_dump())
+    return reminder
+
+
+def test_appointment_start_keeps_day_slots_on_their_date():
+    start = server.appointment_start("2026-10-19", "10:00", server.Settings())
+    assert start == datetime(2026, 10, 19, 7, 0, tzinfo=timezone.utc)
+
+
+def test_appointment_start_moves_night_slots_to_the_following_night():
+    # Working 07:00-03:00, a 01:00 slot on the 19th is the night after the 19th
+    start = server.appointment_start("2026-10-19", "01:00", server.Settings())
+    assert start == datetime(2026, 10, 19, 22, 0, tzinfo=timezone.utc)
+
+    # Without a night shift the time is taken literally
+    settings = server.Settings(work_start_hour=0, work_end_hour=23)
+    assert server.appointment_start("2026-10-19", "01:00", settings) == datetime(2026, 10, 18, 22, 0, tzinfo=timezone.utc)
+
+
+def test_same_day_night_slot_is_still_ahead():
+    today = datetime.now(server.TURKEY_TZ).date().isoformat()
+    assert server.appointment_start(today, "01:00", server.Settings()) > datetime.now(timezone.utc)
+
+
+def test_schedule_reminders_is_idempotent(run_with_db):
+    async def test(db):
+        appointment = await insert_appointment(db, id="a1")
+        await server.schedule_reminders(appointment)
+        await server.schedule_reminders(appointment)
+        reminders = await db.reminders.find({"appointment_id": "a1"}).to_list(None)
+        assert sorted(r['offset_minutes'] for r in reminders) == [120, 1440]
+        assert all(r['status'] == "pending" for r in reminders)
+
+    run_with_db(test)
+
+
+def test_cancelling_an_appointment_drops_pending_reminders(run_with_db):
+    async def test(db):
+        await db.services.insert_one({"id": "service-1", "name": "Koltuk", "price": 650, "duration": 60,
+                                      "created_at": datetime.now(timezone.utc).isoformat()})
+        created = await server.create_appointment(server.AppointmentCreate(
+            customer_name="Ali Yılmaz", phone="05551234567", address="Adres",
+            service_id="service-1", appointment_date=future_date(3), appointment_time="10:00"
+        ))
+        assert await db.reminders.count_documents({"appointment_id": created.id, "status": "pending"}) == 2
+
+        await server.update_appointment(created.id, server.AppointmentUpdate(status="İptal"))
+        assert await db.reminders.count_documents({"appointment_id": created.id, "status": "pending"}) == 0
+
+    run_with_db(test)
+
+
+def test_dispatch_sends_valid_reminders_and_skips_stale_ones(run_with_db):
+    async def test(db):
+        valid = await insert_appointment(db, id="valid")
+        cancelled = await insert_appointment(db, id="cancelled", status="İptal")
+        moved = await insert_appointment(db, id="moved")
+        valid_reminder = await insert_due_reminder(db, valid)
+        cancelled_reminder = await insert_due_reminder(db, cancelled)
+        moved_reminder = await insert_due_reminder(db, moved)
+        # Rescheduled after the reminder was created
+        await db.appointments.update_one({"id": "moved"}, {"$set": {"appointment_time": "14:00"}})
+
+        assert await server.dispatch_due_reminders() == 3
+
+        statuses = {r['id']: r['status'] for r in await db.reminders.find().to_list(None)}
+        assert statuses == {
+            valid_reminder.id: "sent",
+            cancelled_reminder.id: "skipped",
+            moved_reminder.id: "skipped"
+        }
+
+    run_with_db(test)
+    assert len(run_with_db.sent_sms) == 1
+
+
+def test_dispatch_skips_reminders_that_are_too_late(run_with_db):
+    async def test(db):
+        # After downtime both reminders of one appointment are due; only the closer one is worth sending
+        both_due = await insert_appointment(db, id="both-due")
+        day_before = await insert_due_reminder(db, both_due, offset_minutes=1440, minutes_late=30)
+        hours_before = await insert_due_reminder(db, both_due, offset_minutes=120, minutes_late=1)
+        # Past the grace period on its own
+        late = await insert_appointment(db, id="late")
+        late_reminder = await insert_due_reminder(db, late, minutes_late=server.REMINDER_GRACE_MINUTES + 5)
+
+        assert await server.dispatch_due_reminders() == 3
+
+        statuses = {r['id']: r['status'] for r in await db.reminders.find().to_list(None)}
+        assert statuses == {
+            day_before.id: "skipped",
+            hours_before.id: "sent",
+            late_reminder.id: "skipped"
+        }
+
+    run_with_db(test)
+    assert len(run_with_db.sent_sms) == 1
+
+
+def test_sync_reminders_backfills_and_follows_offset_changes(run_with_db):
+    async def test(db):
+        await insert_appointment(db, id="existing")
+        await server.sync_reminders()
+        offsets = {r['offset_minutes'] for r in await db.reminders.find({"status": "pending"}).to_list(None)}
+        assert offsets == {120, 1440}
+
+        await server.update_settings(server.Settings(reminder_offsets=[60]))
+        await server.sync_reminders()
+        offsets = {r['offset_minutes'] for r in await db.reminders.find({"status": "pending"}).to_list(None)}
+        assert offsets == {60}
+
+    run_with_db(test)
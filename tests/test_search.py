@@ -0,0 +1,25 @@
+import pytest
+
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+
+
+def matches(search: str, customer_name: str, phone: str) -> bool:
+    """Evaluate the search filter the way Mongo does against an appointment's search_terms"""
+    terms = server.search_terms(customer_name, phone)
+    patterns = server.appointments_query(search=search)['search_terms']['$all']
+    return all(any(pattern.match(term) for term in terms) for pattern in patterns)
+
+
+@pytest.mark.parametrize("search", ["Yılmaz", "yilmaz", "lmaz", "ali yıl", "YIL ALI", "İsmail"])
+def test_names_match_any_part_of_a_word(search):
+    assert matches(search, "Ali Yılmaz İsmail", "05551234567")
+
+
+@pytest.mark.parametrize("search", ["4567", "0555-123", "0555 123 45 67", "(0555) 123 45 67", "+90 555 123 45 67", "+905551234567", "905551234567"])
+def test_phone_numbers_match_regardless_of_formatting(search):
+    assert matches(search, "Ali Yılmaz", "0555 123 45 67")
+
+
+@pytest.mark.parametrize("search", ["veli", "ali 9999", "0556"])
+def test_every_term_must_match(search):
+    assert not matches(search, "Ali Yılmaz", "05551234567")
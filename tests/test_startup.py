@@ -0,0 +1,25 @@
+import pytest
+
+server = pytest.importorskip("server", reason="backend dependencies are not installed")
+
+
+def test_startup_removes_duplicate_settings_before_indexing(run_with_db, monkeypatch):
+    monkeypatch.setattr(server.command_profiler, 'loop', None)
+
+    async def test(db):
+        # A database from before the unique index, where two first loads both inserted the defaults
+        await db.settings.drop_indexes()
+        await db.settings.insert_many([
+            server.Settings(crew_count=2).model_dump(),
+            server.Settings().model_dump(),
+            server.ProfilingSettings().model_dump()
+        ])
+
+        await server.create_indexes()
+
+        assert await db.settings.count_documents({"id": "app_settings"}) == 1
+        assert (await server.get_settings()).crew_count == 2
+        index_keys = [index['key'] for index in (await db.settings.index_information()).values()]
+        assert [("id", 1)] in index_keys
+
+    run_with_db(test)